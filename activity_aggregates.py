@@ -0,0 +1,175 @@
+import json
+import logging
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+from settings import Settings
+from aggregator import Row, ServerSplit, top_k
+
+log = logging.getLogger(__name__)
+
+def reconcile_deltas(before: ServerSplit, after: ServerSplit) -> ServerSplit:
+    """Додатні різниці між старими і новими сумами місяця (чиста функція - може виконуватись у пулі)"""
+    deltas: ServerSplit = {}
+    for player_id, servers in after.items():
+        previous = before.get(player_id, {})
+        for server_id, value in servers.items():
+            delta = value - previous.get(server_id, 0)
+            if delta > 0:
+                deltas.setdefault(player_id, {})[server_id] = delta
+    return deltas
+
+class ActivityAggregates:
+    """Денні суми часу гравців по серверах за останні дні (один JSON файл на день)
+
+    Заповнюється з тих самих вікон інкрементального оновлення, що й RunningTotals,
+    тому /activity і /weektop не роблять жодного запиту до Battlemetrics.
+    """
+
+    def __init__(self, directory: str, retention_days: int = Settings.ACTIVITY_RETENTION_DAYS):
+        self.directory = directory
+        self.retention_days = retention_days
+        # day -> player_id -> {server_id: seconds}
+        self.days: Dict[str, ServerSplit] = {}
+        self.names: Dict[int, str] = {}
+        # Дні, змінені з останнього запису - на диск пишемо тільки їх
+        self._dirty: Set[str] = set()
+        self._mtimes: Dict[str, int] = {}
+        self._loaded = False
+
+    def _path(self, day: str) -> str:
+        return os.path.join(self.directory, f"{day}.json")
+
+    def add_rows(self, day: str, server_id: int, rows: List[Row]):
+        """Додає рядки вікна одного сервера до суми дня (вікно вже обрізане по півночі)"""
+        players = self.days.get(day)
+        if players is None:
+            players = self.days[day] = {}
+        for player_id, name, value in rows:
+            servers = players.get(player_id)
+            if servers is None:
+                servers = players[player_id] = {}
+            servers[server_id] = servers.get(server_id, 0) + value
+            self.names[player_id] = name
+        self._dirty.add(day)
+
+    def add_split(self, day: str, split: ServerSplit, names: Dict[int, str]):
+        """Додає готові суми {player_id: {server_id: seconds}} до дня (наприклад, різницю після повної звірки)"""
+        players = self.days.setdefault(day, {})
+        for player_id, servers in split.items():
+            target = players.setdefault(player_id, {})
+            for server_id, value in servers.items():
+                target[server_id] = target.get(server_id, 0) + value
+            self.names[player_id] = names.get(player_id, self.names.get(player_id, ''))
+        self._dirty.add(day)
+
+    def load(self):
+        """Читає збережені дні в межах зберігання (один раз за життя процесу)"""
+        if self._loaded:
+            return
+        self._loaded = True
+        self.reload_changed()
+        log.info("🦍 Loaded activity for %d days", len(self.days))
+
+    def reload_changed(self):
+        """Перечитує дні, файли яких змінились (у BOT_MODE=consumer їх переписує фетчер)"""
+        if not os.path.isdir(self.directory):
+            return
+
+        oldest = self._oldest_day()
+        for filename in sorted(os.listdir(self.directory)):
+            day, extension = os.path.splitext(filename)
+            if extension != '.json' or day < oldest:
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                mtime = os.stat(path).st_mtime_ns
+                if self._mtimes.get(day) == mtime:
+                    continue
+                # Зіпсований файл не перечитуємо і не логуємо знову, поки його не перепишуть
+                self._mtimes[day] = mtime
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                players = {
+                    int(player_id): {int(server_id): int(value) for server_id, value in servers.items()}
+                    for player_id, servers in data['players'].items()
+                }
+                names = {int(player_id): name for player_id, name in data.get('names', {}).items()}
+            except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+                # День пропускаємо - решта днів і вже прочитані дані лишаються доступними
+                log.warning("🦍 Could not read activity day %s: %s", filename, e)
+                continue
+            self.days[day] = players
+            self.names.update(names)
+        for day in [day for day in self.days if day < oldest]:
+            del self.days[day]
+
+    def take_dirty(self) -> List[Tuple[str, str, Dict]]:
+        """Забирає змінені з останнього запису дні: (day, path, data)"""
+        dirty = []
+        for day in sorted(self._dirty):
+            players = self.days.get(day)
+            if players is not None:
+                dirty.append((day, self._path(day), {
+                    'day': day,
+                    'players': players,
+                    'names': {player_id: self.names.get(player_id, '') for player_id in players}
+                }))
+        self._dirty.clear()
+        return dirty
+
+    def mark_dirty(self, day: str):
+        self._dirty.add(day)
+
+    def prune(self):
+        oldest = self._oldest_day()
+        for day in [day for day in self.days if day < oldest]:
+            del self.days[day]
+            self._dirty.discard(day)
+            try:
+                os.remove(self._path(day))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                log.warning("🦍 Could not remove old activity day %s: %s", day, e)
+
+    def _oldest_day(self) -> str:
+        return (datetime.now(timezone.utc).date() - timedelta(days=self.retention_days - 1)).isoformat()
+
+    def last_days(self, days: int, today: Optional[date] = None) -> List[str]:
+        """Ключі останніх days днів, від найстаршого до сьогодні"""
+        today = today or datetime.now(timezone.utc).date()
+        return [(today - timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1)]
+
+    def player_days(self, player_id: int, days: int) -> List[Tuple[str, Dict[int, int]]]:
+        """Активність гравця по днях: (day, {server_id: seconds}), тільки дні з грою"""
+        self.load()
+        result = []
+        for day in self.last_days(days):
+            servers = self.days.get(day, {}).get(player_id)
+            if servers:
+                result.append((day, servers))
+        return result
+
+    def daily_totals(self, days: int) -> List[Tuple[str, int, int]]:
+        """Загальна активність по днях: (day, seconds, players)"""
+        self.load()
+        result = []
+        for day in self.last_days(days):
+            players = self.days.get(day, {})
+            result.append((day, sum(sum(servers.values()) for servers in players.values()), len(players)))
+        return result
+
+    def most_active(self, days: int, top_n: int, server_id: Optional[int] = None) -> List[Row]:
+        """Топ гравців за останні days днів (весь час або тільки на одному сервері)"""
+        self.load()
+        totals: Dict[int, int] = {}
+        for day in self.last_days(days):
+            for player_id, servers in self.days.get(day, {}).items():
+                value = servers.get(server_id, 0) if server_id is not None else sum(servers.values())
+                if value:
+                    totals[player_id] = totals.get(player_id, 0) + value
+        return [(player_id, self.names.get(player_id, ''), value) for player_id, value in top_k(totals, top_n)]
+
+# Глобальні денні агрегати активності
+activity_aggregates = ActivityAggregates(Settings.ACTIVITY_DIR)
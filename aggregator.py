@@ -0,0 +1,49 @@
+import heapq
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Рядок лідерборду: (player_id, name, value)
+Row = Tuple[int, str, int]
+# Час гравців по серверах: player_id -> {server_id: seconds}
+ServerSplit = Dict[int, Dict[int, int]]
+
+_by_value = itemgetter(1)
+
+def top_k(totals: Dict[int, int], k: Optional[int]) -> List[Tuple[int, int]]:
+    """Повертає K найбільших (player_id, value) за спаданням; k=None - всі, відсортовані"""
+    if k is None or k >= len(totals):
+        return sorted(totals.items(), key=_by_value, reverse=True)
+    # Купа розміру K: O(n log K) замість повного сортування O(n log n)
+    return heapq.nlargest(k, totals.items(), key=_by_value)
+
+class TopKMerger:
+    """Інкрементально сумує рядки кількох серверів по player_id і віддає топ K"""
+
+    def __init__(self):
+        self.totals: Dict[int, int] = {}
+        self.names: Dict[int, str] = {}
+        # Бітова маска серверів де гравця вже бачили (для оцінки меж при пагінації)
+        self.seen: Dict[int, int] = {}
+        self.rows = 0
+
+    def add(self, server_index: int, rows: Iterable[Row]):
+        totals = self.totals
+        names = self.names
+        seen = self.seen
+        server_bit = 1 << server_index
+        count = 0
+        for player_id, name, value in rows:
+            previous = totals.get(player_id)
+            if previous is None:
+                totals[player_id] = value
+                names[player_id] = name
+                seen[player_id] = server_bit
+            else:
+                totals[player_id] = previous + value
+                seen[player_id] |= server_bit
+            count += 1
+        self.rows += count
+
+    def top(self, k: Optional[int]) -> List[Row]:
+        names = self.names
+        return [(player_id, names[player_id], value) for player_id, value in top_k(self.totals, k)]
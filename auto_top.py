@@ -0,0 +1,75 @@
+import asyncio
+import discord
+import logging
+from typing import Dict
+from settings import Settings
+from embeds import EmbedCache, embed_cache
+from subscriptions import Subscription, SubscriptionRegistry, subscription_registry
+
+log = logging.getLogger(__name__)
+
+class AutoTopScheduler:
+    """Оновлює всі підписані повідомлення з топом паралельно, пропускаючи ті, що не змінились"""
+
+    def __init__(self, registry: SubscriptionRegistry, embeds: EmbedCache,
+                 concurrency: int = Settings.AUTO_TOP_CONCURRENCY):
+        self.registry = registry
+        self.embeds = embeds
+        # Загальне обмеження паралельних редагувань + по одному редагуванню на канал одночасно
+        # (у Discord ліміт на редагування повідомлень рахується окремо для кожного каналу)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._channel_locks: Dict[int, asyncio.Lock] = {}
+        self.edited = 0
+        self.skipped = 0
+
+    async def run_once(self, client: discord.Client) -> int:
+        """Розсилає поточне покоління по всіх підписках; повертає кількість відредагованих повідомлень"""
+        subscriptions = self.registry.all()
+        if not subscriptions:
+            return 0
+
+        results = await asyncio.gather(*(self._update(client, subscription) for subscription in subscriptions))
+        edited = sum(1 for result in results if result)
+        if edited:
+            # Зберігаємо нові хеші, щоб після перезапуску не редагувати те саме
+            self.registry.save_hashes(subscriptions)
+        log.info("🦍 Auto-update: %d edited, %d unchanged or failed", edited, len(subscriptions) - edited)
+        return edited
+
+    async def _update(self, client: discord.Client, subscription: Subscription) -> bool:
+        embed = self.embeds.get(subscription.view)
+        if not embed:
+            return False
+
+        content_hash = self.embeds.content_hash(subscription.view)
+        if content_hash == subscription.content_hash:
+            self.skipped += 1
+            return False
+
+        lock = self._channel_locks.setdefault(subscription.channel_id, asyncio.Lock())
+        async with self._semaphore, lock:
+            try:
+                channel = client.get_channel(subscription.channel_id) or await client.fetch_channel(subscription.channel_id)
+                # Часткове повідомлення - редагуємо без зайвого fetch_message
+                await channel.get_partial_message(subscription.message_id).edit(embed=embed)
+            except discord.NotFound:
+                log.warning("🦍 Auto-update message %s in channel %s is gone, unsubscribing",
+                            subscription.message_id, subscription.channel_id)
+                self.registry.remove(subscription)
+                return False
+            except discord.Forbidden as e:
+                # Бота вигнали з каналу або забрали права - повтори кожне покоління нічого не змінять
+                log.warning("🦍 No access to auto-update message %s in channel %s (%s), unsubscribing",
+                            subscription.message_id, subscription.channel_id, e)
+                self.registry.remove(subscription)
+                return False
+            except discord.HTTPException as e:
+                log.error("Error in auto update of channel %s: %s", subscription.channel_id, e)
+                return False
+
+        subscription.content_hash = content_hash
+        self.edited += 1
+        return True
+
+# Глобальний планувальник автооновлень
+auto_top_scheduler = AutoTopScheduler(subscription_registry, embed_cache)
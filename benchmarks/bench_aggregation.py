@@ -0,0 +1,72 @@
+"""Порівняння об'єднання лідербордів серверів: старий шлях (dict + sorted) проти TopKMerger
+
+Запуск: python benchmarks/bench_aggregation.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregator import TopKMerger
+from parser import Player
+
+SIZES = (1000, 10000, 100000)
+SERVERS = 3
+TOP_K = 100
+REPEATS = 5
+
+def make_streams(total_rows: int):
+    """Генерує відсортовані лідерборди серверів з частковим перетином гравців"""
+    rng = random.Random(total_rows)
+    per_server = total_rows // SERVERS
+    population = range(1, per_server * 2)
+    streams = []
+    for _ in range(SERVERS):
+        ids = rng.sample(population, per_server)
+        rows = [(player_id, f"player{player_id}", int(rng.paretovariate(1.2) * 600)) for player_id in ids]
+        rows.sort(key=lambda row: row[2], reverse=True)
+        streams.append(rows)
+    return streams
+
+def legacy_path(streams):
+    """Як було раніше: Player на кожен рядок, дедуплікація через словник і повне сортування"""
+    players = [Player(name, player_id, value) for stream in streams for player_id, name, value in stream]
+    unique_players = {}
+    for player in players:
+        if player.id in unique_players:
+            unique_players[player.id].value += player.value
+        else:
+            unique_players[player.id] = player
+    return sorted(unique_players.values(), key=lambda x: x.value, reverse=True)[:TOP_K]
+
+def merger_path(streams):
+    merger = TopKMerger()
+    for index, stream in enumerate(streams):
+        merger.add(index, stream)
+    return merger.top(TOP_K)
+
+def measure(function, streams) -> float:
+    best = float('inf')
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        function(streams)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+def main():
+    paths = [('legacy dict+sorted', legacy_path), ('TopKMerger (heap)', merger_path)]
+
+    print(f"{'rows':>8}  " + "  ".join(f"{name:>20}" for name, _ in paths))
+    for size in SIZES:
+        streams = make_streams(size)
+        expected = [(p.id, p.value) for p in legacy_path(streams)]
+        for name, function in paths[1:]:
+            result = function(streams)
+            assert [(row[0], row[2]) for row in result] == expected, f"{name} differs from legacy result"
+        timings = [measure(function, streams) for _, function in paths]
+        print(f"{size:>8}  " + "  ".join(f"{timing:>17.2f} ms" for timing in timings))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Порівняння розбору сторінок лідерборду: stdlib json проти orjson і msgspec (що з них встановлено)
+
+Запуск: python benchmarks/bench_json.py
+"""
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json_backend
+from json_backend import _rows_from_document
+
+PAGES = 300  # 3 сервери по 100 сторінок
+PAGE_SIZE = 100
+REPEATS = 5
+
+def make_pages():
+    """Сторінки у форматі Battlemetrics - з усіма полями, які бот ігнорує"""
+    rng = random.Random(1)
+    pages = []
+    for page_index in range(PAGES):
+        data = [{
+            'type': 'leaderboardPlayer',
+            'id': str(rng.randrange(1, 10 ** 9)),
+            'attributes': {'name': f"player {rng.randrange(10 ** 6)} ✦", 'value': rng.randrange(1, 10 ** 6),
+                           'rank': page_index * PAGE_SIZE + index + 1},
+            'relationships': {'server': {'data': {'type': 'server', 'id': '30985204'}}}
+        } for index in range(PAGE_SIZE)]
+        links = {'next': f"https://api.battlemetrics.com/servers/1/relationships/leaderboards/time?page[offset]={page_index + 1}"}
+        pages.append(json.dumps({'data': data, 'links': links}).encode())
+    return pages
+
+def measure(name, decode, pages):
+    best = float('inf')
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        rows = sum(len(decode(body)[0]) for body in pages)
+        best = min(best, time.perf_counter() - started)
+    print(f"{name:>10}: {best * 1000:8.1f} ms for {rows} rows ({best / len(pages) * 1e6:.0f} us/page)")
+
+def main():
+    pages = make_pages()
+    print(f"{PAGES} pages x {PAGE_SIZE} rows, {sum(map(len, pages)) / 1024 / 1024:.1f} MiB; active backend: {json_backend.BACKEND}")
+    measure('stdlib', lambda body: _rows_from_document(json.loads(body)), pages)
+    if json_backend.orjson is not None:
+        measure('orjson', lambda body: _rows_from_document(json_backend.orjson.loads(body)), pages)
+    if json_backend.msgspec is not None:
+        decoder = json_backend._page_decoder
+
+        def decode_typed(body):
+            page = decoder.decode(body)
+            return [(entry.id, entry.attributes.name, entry.attributes.value) for entry in page.data], page.links.next
+
+        measure('msgspec', decode_typed, pages)
+    measure('active', json_backend.decode_leaderboard_page, pages)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""Наскрізний бенчмарк оновлення кешу: DataCache.update_data проти локального фейкового Battlemetrics
+
+Перший прогін - холодний старт (повна звірка поточного місяця, попередній місяць, Steam ID),
+наступні - звичайні оновлення (інкрементальні вікна, якщо не вказано --full).
+
+Колонка "max lag" - найбільша затримка event loop під час прогону (порівняйте --worker-pool inline/thread/process).
+
+Запуск: python benchmarks/bench_refresh.py --players 20000 --latency 0.05 --runs 3
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_battlemetrics import FakeBattleMetrics, add_arguments
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def configure_environment(args: argparse.Namespace, port: int, data_dir: str):
+    """Settings читає змінні середовища при імпорті, тому виставляємо їх до імпорту модулів бота"""
+    os.environ['BM_API_URL'] = f"http://127.0.0.1:{port}"
+    os.environ['TOKEN_BM'] = 'benchmark'
+    os.environ['SERVER_IDS'] = ','.join(map(str, args.servers))
+    os.environ['DATA_DIR'] = data_dir
+    os.environ['BM_RATE_LIMIT_PER_MINUTE'] = str(args.rate_per_minute)
+    os.environ['BM_RATE_LIMIT_BURST'] = str(args.burst)
+    os.environ['INCREMENTAL_REFRESH'] = '0' if args.full else '1'
+    os.environ['LOG_LEVEL'] = args.log_level
+    os.environ['WORKER_POOL'] = args.worker_pool
+    os.environ['WORKER_POOL_MIN_ITEMS'] = str(args.worker_min_items)
+
+class LagProbe:
+    """Часто засинає і запам'ятовує найбільше запізнення - так само затримався б обробник команди Discord"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.max_lag = 0.0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.max_lag = max(self.max_lag, loop.time() - expected)
+
+    def stop(self):
+        self._task.cancel()
+
+def start_in_thread(fake: FakeBattleMetrics, port: int):
+    """Фейковий сервер - в окремому потоці зі своїм event loop, щоб його робота не потрапляла в "max lag" бота"""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, name='fake-battlemetrics', daemon=True)
+    thread.start()
+    runner = asyncio.run_coroutine_threadsafe(fake.start('127.0.0.1', port), loop).result()
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+    return stop
+
+async def run(args: argparse.Namespace):
+    port = free_port()
+    data_dir = tempfile.mkdtemp(prefix='squadbot-bench-')
+    configure_environment(args, port, data_dir)
+    logging.basicConfig(level=args.log_level, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    from bm_client import bm_client
+    from data_cache import data_cache
+    from rate_limiter import rate_limiter
+    from worker_pool import worker_pool
+
+    fake = FakeBattleMetrics(args.servers, players=args.players, latency=args.latency, jitter=args.jitter,
+                             rate_limit_every=args.rate_limit_every, retry_after=args.retry_after,
+                             reject_iso_periods=args.reject_iso_periods, bulk_players=args.bulk_players,
+                             ignore_player_filter=args.ignore_player_filter)
+    stop_fake = start_in_thread(fake, port)
+
+    print(f"Fake Battlemetrics: {args.players} players, servers {args.servers}, latency {args.latency}s, "
+          f"429 every {args.rate_limit_every or '-'}, worker pool {worker_pool.mode}, data in {data_dir}")
+    print(f"{'run':>4} {'result':>7} {'wall, s':>9} {'requests':>9} {'429':>5} {'limiter wait, s':>16} "
+          f"{'peak mem, MiB':>14} {'max lag, ms':>12} {'players':>8}")
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    try:
+        for run_index in range(1, args.runs + 1):
+            requests_before = dict(fake.requests)
+            wait_before = rate_limiter.wait_seconds
+            if args.tracemalloc:
+                tracemalloc.reset_peak()
+
+            probe = LagProbe()
+            probe.start()
+            started = time.perf_counter()
+            ok = await data_cache.update_data()
+            wall = time.perf_counter() - started
+            probe.stop()
+
+            peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024) if args.tracemalloc else float('nan')
+            requests = fake.requests['total'] - requests_before.get('total', 0)
+            rate_limited = fake.requests['429'] - requests_before.get('429', 0)
+            print(f"{run_index:>4} {'ok' if ok else 'FAILED':>7} {wall:>9.3f} {requests:>9} {rate_limited:>5} "
+                  f"{rate_limiter.wait_seconds - wait_before:>16.3f} {peak:>14.2f} {probe.max_lag * 1000:>12.1f} "
+                  f"{len(data_cache.current_month_data):>8}")
+
+            if run_index < args.runs:
+                # Вікна інкрементального оновлення - цілі секунди
+                await asyncio.sleep(args.pause)
+    finally:
+        if args.tracemalloc:
+            tracemalloc.stop()
+        await bm_client.close()
+        stop_fake()
+        worker_pool.shutdown()
+
+    print(f"Requests by endpoint: {dict(fake.requests)}")
+
+def main():
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(cli)
+    cli.add_argument('--runs', type=int, default=3)
+    cli.add_argument('--pause', type=float, default=1.1, help="Пауза між прогонами (сек)")
+    cli.add_argument('--full', action='store_true', help="Без інкрементального режиму (INCREMENTAL_REFRESH=0)")
+    cli.add_argument('--rate-per-minute', type=float, default=1_000_000,
+                     help="Ліміт клієнта; 60 - як у справжнього Battlemetrics")
+    cli.add_argument('--burst', type=int, default=1000)
+    cli.add_argument('--no-tracemalloc', dest='tracemalloc', action='store_false',
+                     help="Не міряти пам'ять (tracemalloc уповільнює прогін)")
+    cli.add_argument('--log-level', default='WARNING')
+    cli.add_argument('--worker-pool', choices=('thread', 'process', 'inline'), default='thread',
+                     help="Де рахувати CPU-важкі етапи оновлення (WORKER_POOL)")
+    cli.add_argument('--worker-min-items', type=int, default=2000, help="WORKER_POOL_MIN_ITEMS")
+    asyncio.run(run(cli.parse_args()))
+
+if __name__ == '__main__':
+    main()
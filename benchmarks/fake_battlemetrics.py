@@ -0,0 +1,254 @@
+"""Локальний фейковий Battlemetrics API для бенчмарків і перевірок без мережі і токенів
+
+Підтримує ті ендпоінти, які використовує бот:
+  GET /servers/{id}/relationships/leaderboards/time  - лідерборд за період з пагінацією по links.next
+  GET /players/{id}?include=identifier                - ідентифікатори гравця (Steam ID)
+  GET /players?filter[ids]=1,2&include=identifier     - те саме пачкою, з пагінацією
+  GET /servers/{id}                                   - онлайн сервера
+
+Час гравця за період = його "частка онлайну" * тривалість періоду, тому сусідні вікна
+в сумі дають стільки ж (з точністю до округлення), скільки повний період - інкрементальне оновлення можна звіряти.
+
+Окремий запуск: python benchmarks/fake_battlemetrics.py --port 8765 --latency 0.05
+і далі бот з BM_API_URL=http://127.0.0.1:8765 та будь-яким TOKEN_BM.
+"""
+import argparse
+import asyncio
+import random
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+from aiohttp import web
+
+ISO_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+DATE_FORMAT = "%Y-%m-%d"
+
+class FakeBattleMetrics:
+    """Детермінований (за seed) симулятор Battlemetrics з інжекцією затримок, 429 і 400"""
+
+    def __init__(self, server_ids: List[int], players: int = 5000, seed: int = 1,
+                 latency: float = 0.0, jitter: float = 0.0,
+                 rate_limit_every: int = 0, retry_after: float = 1.0,
+                 reject_iso_periods: bool = False, steam_coverage: float = 0.9,
+                 max_page_size: int = 100, bulk_players: bool = True, ignore_player_filter: bool = False):
+        self.server_ids = list(server_ids)
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.reject_iso_periods = reject_iso_periods
+        self.max_page_size = max_page_size
+        self.bulk_players = bulk_players
+        # Як API, що мовчки ігнорує filter[ids]: /players віддає всіх гравців підряд
+        self.ignore_player_filter = ignore_player_filter
+        self.base_url = ''
+
+        rng = random.Random(seed)
+        # player_id -> (name, steam_id або 0)
+        self.players: Dict[int, Tuple[str, int]] = {}
+        # server_id -> [(player_id, частка часу онлайн)]
+        self.rosters: Dict[int, List[Tuple[int, float]]] = {}
+        player_ids = rng.sample(range(1, players * 20), players)
+        for player_id in player_ids:
+            steam_id = 76561197960265728 + player_id if rng.random() < steam_coverage else 0
+            self.players[player_id] = (f"player{player_id}", steam_id)
+        for server_id in self.server_ids:
+            # Кожен сервер бачить частину гравців - частина гравців грає на кількох серверах
+            members = rng.sample(player_ids, max(1, int(players * 0.6)))
+            self.rosters[server_id] = [(player_id, min(0.6, rng.paretovariate(1.2) / 200)) for player_id in members]
+
+        self.requests: Counter = Counter()
+        self._rng = random.Random(seed + 1)
+        self._boards: 'OrderedDict[Tuple[int, str], List[Tuple[int, int]]]' = OrderedDict()
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get('/servers/{server_id}/relationships/leaderboards/time', self.leaderboard)
+        app.router.add_get('/servers/{server_id}', self.server)
+        app.router.add_get('/players', self.players_list)
+        app.router.add_get('/players/{player_id}', self.player)
+        return app
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> web.AppRunner:
+        runner = web.AppRunner(self.app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}"
+        return runner
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        self.requests['total'] += 1
+        number = self.requests['total']
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + self._rng.random() * self.jitter)
+        if self.rate_limit_every and number % self.rate_limit_every == 0:
+            self.requests['429'] += 1
+            return web.json_response({'errors': [{'title': 'Too Many Requests'}]}, status=429,
+                                     headers={'Retry-After': str(self.retry_after)})
+        return await handler(request)
+
+    def _parse_period(self, period: str) -> Optional[Tuple[datetime, datetime]]:
+        if 'T' in period:
+            # Після ':' в ISO форматі ще є двокрапки часу - ділимо по 'Z:'
+            start, _, end = period.partition('Z:')
+            start += 'Z'
+            parse = lambda value: datetime.strptime(value, ISO_FORMAT)
+        else:
+            start, _, end = period.partition(':')
+            parse = lambda value: datetime.strptime(value, DATE_FORMAT)
+        try:
+            start_at = parse(start).replace(tzinfo=timezone.utc)
+            end_at = parse(end).replace(tzinfo=timezone.utc)
+        except ValueError:
+            return None
+        if 'T' not in period:
+            end_at += timedelta(days=1)  # Дата кінця включно
+        return start_at, min(end_at, datetime.now(timezone.utc))
+
+    def _board(self, server_id: int, period: str, window: Tuple[datetime, datetime]) -> List[Tuple[int, int]]:
+        key = (server_id, period)
+        board = self._boards.get(key)
+        if board is None:
+            seconds = max(0.0, (window[1] - window[0]).total_seconds())
+            board = [(player_id, int(share * seconds)) for player_id, share in self.rosters[server_id]]
+            board = [row for row in board if row[1] > 0]
+            board.sort(key=lambda row: row[1], reverse=True)
+            self._boards[key] = board
+            if len(self._boards) > 64:
+                self._boards.popitem(last=False)
+        return board
+
+    async def leaderboard(self, request: web.Request) -> web.Response:
+        self.requests['leaderboard'] += 1
+        server_id = int(request.match_info['server_id'])
+        if server_id not in self.rosters:
+            return web.json_response({'errors': [{'title': 'Unknown server'}]}, status=404)
+
+        period = request.query.get('filter[period]', '')
+        if self.reject_iso_periods and 'T' in period:
+            self.requests['400'] += 1
+            return web.json_response({'errors': [{'title': 'Invalid period format'}]}, status=400)
+        window = self._parse_period(period)
+        if window is None:
+            self.requests['400'] += 1
+            return web.json_response({'errors': [{'title': 'Invalid period'}]}, status=400)
+
+        size = min(self.max_page_size, int(request.query.get('page[size]', '10')))
+        offset = int(request.query.get('page[offset]', '0'))
+        board = self._board(server_id, period, window)
+        page = board[offset:offset + size]
+
+        next_link = None
+        if offset + size < len(board):
+            query = dict(request.query)
+            query['page[offset]'] = str(offset + size)
+            next_link = f"{self.base_url}{request.path}?{urlencode(query)}"
+
+        return web.json_response({
+            'data': [
+                {'type': 'leaderboardPlayer', 'id': str(player_id),
+                 'attributes': {'name': self.players[player_id][0], 'value': value, 'rank': offset + index + 1}}
+                for index, (player_id, value) in enumerate(page)
+            ],
+            'links': {'next': next_link}
+        })
+
+    def _identifiers(self, player_id: int) -> List[Dict]:
+        name, steam_id = self.players[player_id]
+        owner = {'player': {'data': {'type': 'player', 'id': str(player_id)}}}
+        identifiers = [{'type': 'identifier', 'id': f"n{player_id}",
+                        'attributes': {'type': 'name', 'identifier': name}, 'relationships': owner}]
+        if steam_id:
+            identifiers.append({'type': 'identifier', 'id': f"s{player_id}",
+                                'attributes': {'type': 'steamID', 'identifier': str(steam_id)}, 'relationships': owner})
+        return identifiers
+
+    async def player(self, request: web.Request) -> web.Response:
+        self.requests['player'] += 1
+        player_id = int(request.match_info['player_id'])
+        if player_id not in self.players:
+            return web.json_response({'errors': [{'title': 'Unknown player'}]}, status=404)
+        return web.json_response({
+            'data': {'type': 'player', 'id': str(player_id), 'attributes': {'name': self.players[player_id][0]}},
+            'included': self._identifiers(player_id)
+        })
+
+    async def players_list(self, request: web.Request) -> web.Response:
+        self.requests['players_bulk'] += 1
+        if not self.bulk_players or 'filter[ids]' not in request.query:
+            self.requests['400'] += 1
+            return web.json_response({'errors': [{'title': 'Unknown filter'}]}, status=400)
+
+        try:
+            requested = [int(value) for value in request.query['filter[ids]'].split(',') if value]
+        except ValueError:
+            self.requests['400'] += 1
+            return web.json_response({'errors': [{'title': 'Invalid filter[ids]'}]}, status=400)
+        if self.ignore_player_filter:
+            known = list(self.players)
+        else:
+            known = [player_id for player_id in requested if player_id in self.players]
+
+        size = min(self.max_page_size, int(request.query.get('page[size]', '10')))
+        offset = int(request.query.get('page[offset]', '0'))
+        page = known[offset:offset + size]
+
+        next_link = None
+        if offset + size < len(known):
+            query = dict(request.query)
+            query['page[offset]'] = str(offset + size)
+            next_link = f"{self.base_url}{request.path}?{urlencode(query)}"
+
+        return web.json_response({
+            'data': [{'type': 'player', 'id': str(player_id), 'attributes': {'name': self.players[player_id][0]}}
+                     for player_id in page],
+            'included': [identifier for player_id in page for identifier in self._identifiers(player_id)],
+            'links': {'next': next_link}
+        })
+
+    async def server(self, request: web.Request) -> web.Response:
+        self.requests['server'] += 1
+        server_id = int(request.match_info['server_id'])
+        if server_id not in self.rosters:
+            return web.json_response({'errors': [{'title': 'Unknown server'}]}, status=404)
+        online = min(100, sum(1 for _, share in self.rosters[server_id] if self._rng.random() < share))
+        return web.json_response({
+            'data': {'type': 'server', 'id': str(server_id), 'attributes': {'players': online, 'maxPlayers': 100}}
+        })
+
+async def serve(args: argparse.Namespace):
+    fake = FakeBattleMetrics(args.servers, players=args.players, latency=args.latency, jitter=args.jitter,
+                             rate_limit_every=args.rate_limit_every, retry_after=args.retry_after,
+                             reject_iso_periods=args.reject_iso_periods, bulk_players=args.bulk_players,
+                             ignore_player_filter=args.ignore_player_filter)
+    await fake.start(args.host, args.port)
+    print(f"Fake Battlemetrics on {fake.base_url} (servers: {','.join(map(str, args.servers))})")
+    while True:
+        await asyncio.sleep(3600)
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--servers', type=int, nargs='+', default=[30985204, 4256648])
+    parser.add_argument('--players', type=int, default=5000)
+    parser.add_argument('--latency', type=float, default=0.0, help="Затримка кожної відповіді (сек)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Додаткова випадкова затримка до N сек")
+    parser.add_argument('--rate-limit-every', type=int, default=0, help="Кожен N-й запит отримує 429")
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--reject-iso-periods', action='store_true', help="400 на періоди з часом (перевірка fallback)")
+    parser.add_argument('--no-bulk-players', dest='bulk_players', action='store_false',
+                        help="400 на /players?filter[ids] (перевірка пошуку Steam ID поодинці)")
+    parser.add_argument('--ignore-player-filter', action='store_true',
+                        help="/players ігнорує filter[ids] і віддає всіх гравців (перевірка захисту від обходу колекції)")
+
+if __name__ == '__main__':
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument('--host', default='127.0.0.1')
+    cli.add_argument('--port', type=int, default=8765)
+    add_arguments(cli)
+    try:
+        asyncio.run(serve(cli.parse_args()))
+    except KeyboardInterrupt:
+        pass
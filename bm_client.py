@@ -0,0 +1,116 @@
+import aiohttp
+import logging
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+from settings import Settings
+from rate_limiter import RateLimiter, rate_limiter
+from json_backend import loads
+from metrics import bm_rate_limited, bm_request_seconds, bm_requests, endpoint_label
+
+log = logging.getLogger(__name__)
+
+class BMResponse:
+    """Повністю прочитана відповідь API Battlemetrics"""
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes, url: str):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.url = url
+
+    def json(self) -> Any:
+        return loads(self.body)
+
+    def text(self) -> str:
+        return self.body.decode('utf-8', errors='replace')
+
+class BattleMetricsClient:
+    """Єдиний довгоживучий HTTP клієнт для всіх запитів до Battlemetrics"""
+
+    def __init__(self, base_url: str = Settings.BM_API_URL, limiter: RateLimiter = rate_limiter):
+        self.base_url = base_url.rstrip('/')
+        self.limiter = limiter
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Створює сесію при першому використанні (всередині запущеного event loop)"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=Settings.BM_MAX_CONNECTIONS,
+                limit_per_host=Settings.BM_MAX_CONNECTIONS_PER_HOST,
+                keepalive_timeout=Settings.BM_KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=Settings.BM_DNS_CACHE_TTL,
+                enable_cleanup_closed=True
+            )
+            headers = {'Accept': 'application/json'}
+            if Settings.TOKEN_BM:
+                headers['Authorization'] = f'Bearer {Settings.TOKEN_BM}'
+
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=Settings.BM_REQUEST_TIMEOUT)
+            )
+        return self._session
+
+    def url(self, path: str) -> str:
+        """Будує повний URL з відносного шляху API"""
+        if path.startswith('http://') or path.startswith('https://'):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    async def get(self, path: str, params: Optional[Dict[str, str]] = None) -> BMResponse:
+        """Виконує GET запит через глобальний лімітер, повторюючи його після 429"""
+        url = self.url(path)
+        endpoint = endpoint_label(url)
+        for attempt in range(Settings.BM_MAX_RETRIES + 1):
+            await self.limiter.acquire()
+            session = self._get_session()
+            started = time.perf_counter()
+            try:
+                async with session.get(url, params=params) as response:
+                    body = await response.read()
+                    result = BMResponse(response.status, dict(response.headers), body, str(response.url))
+            except Exception:
+                bm_requests.inc(endpoint=endpoint, status='error')
+                raise
+            finally:
+                bm_request_seconds.observe(time.perf_counter() - started, endpoint=endpoint)
+            bm_requests.inc(endpoint=endpoint, status=str(result.status))
+
+            if result.status != 429:
+                return result
+
+            bm_rate_limited.inc(endpoint=endpoint)
+            wait_time = self._parse_retry_after(result.headers.get('Retry-After'))
+            log.warning("Rate limited on %s, pausing all requests for %.1f seconds (attempt %d/%d)",
+                        url, wait_time, attempt + 1, Settings.BM_MAX_RETRIES + 1)
+            self.limiter.backoff(wait_time)
+
+        return result
+
+    @staticmethod
+    def _parse_retry_after(value: Optional[str]) -> float:
+        """Розбирає Retry-After (секунди або HTTP дата)"""
+        if not value:
+            return float(Settings.BM_DEFAULT_RETRY_AFTER)
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+            return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return float(Settings.BM_DEFAULT_RETRY_AFTER)
+
+    async def close(self):
+        """Закриває сесію і всі з'єднання пулу"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+# Глобальний екземпляр клієнта Battlemetrics
+bm_client = BattleMetricsClient()
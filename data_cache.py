@@ -1,66 +1,374 @@
 import asyncio
+import json
+import logging
+import os
+import time
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import Dict, List, Optional
 from parser import Parser, Player
+from paginator import COMPLETE_STATUSES
+from leaderboard import Leaderboard, LeaderboardView
+from bm_client import BattleMetricsClient, bm_client
+from month_archive import MonthArchive, month_archive
+from running_totals import RunningTotals, merge_windows, rank_totals, running_totals
+from activity_aggregates import ActivityAggregates, activity_aggregates, reconcile_deltas
+from history_store import HistoryStore, history_store
+from events import EventBus
+from settings import Settings
+from tools import Tools
+from metrics import refresh_phase_seconds, refreshes
+from worker_pool import WorkerPool, worker_pool
+
+log = logging.getLogger(__name__)
+
+class CacheGeneration:
+    """Незмінний узгоджений набір даних кешу - одне покоління"""
+    
+    def __init__(self, number: int, current_month: Leaderboard, previous_month: Leaderboard,
+                 built_at: Optional[datetime]):
+        self.number = number
+        self.current_month = current_month
+        self.previous_month = previous_month
+        self.built_at = built_at
+    
+    def age_seconds(self) -> Optional[float]:
+        if not self.built_at:
+            return None
+        return (datetime.now(timezone.utc) - self.built_at).total_seconds()
 
 class DataCache:
-    def __init__(self):
-        self.current_month_data: List[Player] = []
-        self.previous_month_data: List[Player] = []
-        self.last_update: Optional[datetime] = None
-        self.is_updating = False
-        
-    async def update_data(self):
-        """Оновлює кешовані дані з API"""
+    def __init__(self, client: BattleMetricsClient = bm_client, archive: MonthArchive = month_archive,
+                 totals: RunningTotals = running_totals, history: HistoryStore = history_store,
+                 activity: ActivityAggregates = activity_aggregates, pool: WorkerPool = worker_pool):
+        self.client = client
+        self.pool = pool
+        self.archive = archive
+        self.totals = totals
+        self.activity = activity
+        self.history = history
+        self.generation = CacheGeneration(0, Leaderboard.empty(), Leaderboard.empty(), None)
+        self._refresh_task: Optional[asyncio.Task] = None
+        # Бот з BOT_MODE=consumer: дані тільки зі знімків фетчера, сам нічого не тягне і не пише
+        self.read_only = False
+        # Battlemetrics не приймає період з часом - дельти неможливі, до перезапуску тільки повні звірки по датах
+        self.iso_periods_rejected = False
+        # Подія "готове нове покоління" - на неї реагують embed, автотоп, історія, метрики
+        self.generation_events = EventBus('generation')
+        self.subscribe(self._record_generation_history)
+    
+    @property
+    def current_month_data(self) -> LeaderboardView:
+        return self.generation.current_month.admin_view()
+    
+    @property
+    def previous_month_data(self) -> LeaderboardView:
+        return self.generation.previous_month.admin_view()
+    
+    @property
+    def last_update(self) -> Optional[datetime]:
+        return self.generation.built_at
+    
+    @property
+    def is_updating(self) -> bool:
+        return self._refresh_task is not None and not self._refresh_task.done()
+    
+    def subscribe(self, handler):
+        """Підписує async-обробник handler(generation) на кожне нове покоління"""
+        return self.generation_events.subscribe(handler)
+    
+    def snapshot(self) -> CacheGeneration:
+        """Повертає поточне покоління - всі дані в ньому узгоджені між собою"""
+        return self.generation
+        
+    async def update_data(self) -> bool:
+        """Оновлює кешовані дані з API; паралельні виклики чекають на те саме оновлення"""
+        if self.read_only:
+            log.warning("🦍 Read-only cache does not fetch data, the fetcher process does")
+            return False
         if self.is_updating:
-            print("🦍 Data update already in progress, skipping...")
-            return
-            
-        self.is_updating = True
-        print(f"🦍 Starting data update at {datetime.now(timezone.utc)}")
+            log.info("🦍 Data update already in progress, waiting for it...")
+        else:
+            self._refresh_task = asyncio.create_task(self._refresh())
+        
+        # shield - щоб скасування одного з тих хто чекає не скасувало оновлення для всіх
+        return await asyncio.shield(self._refresh_task)
+    
+    async def _refresh(self) -> bool:
+        """Будує нове покоління осторонь і підміняє його тільки якщо всі дані отримано"""
+        log.info("🦍 Starting data update")
+        started = time.perf_counter()
         
         try:
-            parser = Parser()
+            parser = Parser(client=self.client)
             
-            # Отримуємо дані поточного місяця
-            print("🦍 Fetching current month data...")
-            current_data = await parser.fetch_and_parse_leaderboard(is_admin=True, is_current_month=True)
-            if current_data:
-                old_count = len(self.current_month_data)
-                self.current_month_data = current_data
-                print(f"🦍 Updated current month data: {old_count} -> {len(current_data)} players")
-            else:
-                print("🦍 No current month data received!")
+            # Обидва місяці (і всі сервери в кожному) завантажуємо паралельно
+            current_data, previous_data = await asyncio.gather(
+                self._get_current_month(parser),
+                self._get_previous_month(parser)
+            )
             
-            # Отримуємо дані попереднього місяця
-            print("🦍 Fetching previous month data...")
-            previous_data = await parser.fetch_and_parse_leaderboard(is_admin=True, is_current_month=False)
-            if previous_data:
-                old_count = len(self.previous_month_data)
-                self.previous_month_data = previous_data
-                print(f"🦍 Updated previous month data: {old_count} -> {len(previous_data)} players")
-            else:
-                print("🦍 No previous month data received!")
+            # None - завантаження не вдалося; порожній список чи топ - це успішна відповідь (місяць може бути порожнім)
+            if current_data is None:
+                log.warning("🦍 No current month data received, keeping generation %d!", self.generation.number)
+                refreshes.inc(result='failed')
+                return False
+            if previous_data is None:
+                log.warning("🦍 No previous month data received, keeping generation %d!", self.generation.number)
+                refreshes.inc(result='failed')
+                return False
+            
+            old = self.generation
+            with refresh_phase_seconds.time(phase='build'):
+                current_month = Leaderboard.from_players(current_data)
+                self.generation = CacheGeneration(old.number + 1, current_month, previous_data, datetime.now(timezone.utc))
+            log.info("🦍 Generation %d: current month %d -> %d players, previous month %d -> %d players",
+                     self.generation.number, len(old.current_month), len(current_month),
+                     len(old.previous_month), len(previous_data))
             
-            self.last_update = datetime.now(timezone.utc)
-            print(f"🦍 Data update completed successfully at {self.last_update}")
+            with refresh_phase_seconds.time(phase='snapshot'):
+                await self.save_snapshot()
+            refresh_phase_seconds.observe(time.perf_counter() - started, phase='total')
+            refreshes.inc(result='ok')
+            log.info("🦍 Data update completed in %.2fs", time.perf_counter() - started)
+            self.generation_events.publish(self.generation)
+            return True
             
         except Exception as e:
-            print(f"🦍 Error during data update: {e}")
-            import traceback
-            traceback.print_exc()
-        finally:
-            self.is_updating = False
+            refreshes.inc(result='error')
+            log.exception("🦍 Error during data update: %s", e)
+            return False
+    
+    @staticmethod
+    def _fetch_failed(server_status: Dict[int, str]) -> bool:
+        """Завантаження місяця не вдалося: якийсь сервер з помилкою або до запису стану взагалі не дійшло"""
+        return set(server_status) != set(Settings.SERVER_IDS) or 'error' in server_status.values()
+    
+    async def _get_current_month(self, parser: Parser) -> Optional[List[Player]]:
+        """Повертає поточний місяць: дельта з моменту останнього оновлення або повна звірка; None - не вдалося"""
+        if not Settings.INCREMENTAL_REFRESH:
+            server_status = {}
+            with refresh_phase_seconds.time(phase='leaderboard_fetch'):
+                players = await parser.fetch_and_parse_leaderboard(is_admin=True, is_current_month=True,
+                                                                   top_n=Settings.LEADERBOARD_STORE_N,
+                                                                   server_status=server_status)
+            return None if self._fetch_failed(server_status) else players
+        
+        if self.totals.month_key is None:
+            self.totals.load()
+        self.activity.load()
+        
+        # Межі вікон - цілі секунди, щоб сусідні вікна стикувались без проміжків
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        month_key = Tools.get_month_key()
+        needs_full = (
+            self.iso_periods_rejected
+            or self.totals.month_key != month_key
+            or self.totals.window_end is None
+            or self.totals.last_full is None
+            or (now - self.totals.last_full).total_seconds() >= Settings.FULL_RECONCILE_INTERVAL
+        )
+        
+        # (день, рядки по серверах) - вікна, які перетинають північ, ріжемо, щоб денні суми були точні
+        windows = []
+        with refresh_phase_seconds.time(phase='leaderboard_fetch'):
+            if not needs_full:
+                log.info("🦍 Incremental refresh since %s...", self.totals.window_end)
+                for start, end in Tools.split_at_midnight(self.totals.window_end, now):
+                    rows_by_server = await parser.fetch_window(Tools.get_period(start=start, end=end))
+                    windows.append((Tools.get_day_key(start), rows_by_server))
+                    if rows_by_server is None:
+                        break
+                if parser.period_rejected:
+                    # Альтернативний формат без часу для вікон не підходить - звіряємо весь місяць по датах
+                    log.warning("🦍 Battlemetrics rejected a window period, falling back to a full reconciliation")
+                    windows = []
+                    needs_full = True
+            if needs_full:
+                log.info("🦍 Full reconciliation of %s...", month_key)
+                # Відомо, що формат з часом не приймається - одразу альтернативний, без зайвого 400
+                period = Tools.get_alternative_period() if self.iso_periods_rejected else Tools.get_period(end=now)
+                rows_by_server = await parser.fetch_window(period, Tools.get_alternative_period())
+                windows.append((Tools.get_day_key(now), rows_by_server))
+            if parser.period_rejected and not self.iso_periods_rejected:
+                log.warning("🦍 Battlemetrics does not accept periods with time, incremental refresh is off until restart")
+                self.iso_periods_rejected = True
+        
+        if any(rows_by_server is None for _, rows_by_server in windows):
+            # Вікно не зсуваємо - наступного разу заберемо ширшу дельту
+            log.warning("🦍 Current month window fetch failed, keeping previous totals")
+            return None
+        
+        with refresh_phase_seconds.time(phase='dedup'):
+            before = self.totals.totals if self.totals.month_key == month_key else {}
+            if needs_full:
+                # Повна звірка - це весь місяць всіх серверів, тому сумуємо в пулі воркерів
+                server_rows = [item for _, rows_by_server in windows for item in rows_by_server.items()]
+                totals, names = await self.pool.run('merge', merge_windows, server_rows,
+                                                    items=sum(len(rows) for _, rows in server_rows))
+                self.totals.reset(month_key)
+                self.totals.totals, self.totals.names = totals, names
+                self.totals.last_full = now
+                await self._add_reconciled_activity(before, now)
+            else:
+                # Один прохід по рядках вікна: місячні суми і денні агрегати по серверах
+                for day, rows_by_server in windows:
+                    for server_id, rows in rows_by_server.items():
+                        self.totals.add_rows(server_id, rows)
+                        self.activity.add_rows(day, server_id, rows)
+            self.totals.window_end = now
+        
+        # Поки йде await, суми ніхто не змінює - оновлення одночасно виконується лише одне
+        with refresh_phase_seconds.time(phase='rank'):
+            leaders = await self.pool.run('rank', rank_totals, self.totals.totals, self.totals.names,
+                                          Settings.LEADERBOARD_STORE_N, items=len(self.totals.totals))
+            players = [Player(name, player_id, value) for player_id, name, value in leaders]
+        with refresh_phase_seconds.time(phase='serialize'):
+            await self.pool.run('serialize', Tools.atomic_write_json, self.totals.path, self.totals.to_dict(),
+                                items=len(self.totals.totals))
+            await self._save_activity()
+        
+        await parser.resolve_steam_ids(players)
+        return players
+    
+    async def _add_reconciled_activity(self, before, now: datetime):
+        """Повна звірка не знає, коли саме награно час - різницю зі старими сумами зараховуємо сьогоднішньому дню"""
+        if not before and now.day != 1:
+            # Без попередніх сум весь місяць записався б в один день - денна історія почнеться з цього моменту
+            log.info("🦍 No previous totals to diff against, daily activity starts now")
+            return
+        deltas = await self.pool.run('reconcile', reconcile_deltas, before, self.totals.totals, items=len(self.totals.totals))
+        self.activity.add_split(Tools.get_day_key(now), deltas, self.totals.names)
+    
+    async def _save_activity(self):
+        for day, path, data in self.activity.take_dirty():
+            try:
+                await self.pool.run('serialize', Tools.atomic_write_json, path, data, items=len(data['players']))
+            except OSError as e:
+                # Не критично - день допишеться при наступному оновленні
+                log.error("🦍 Could not write activity day %s: %s", day, e)
+                self.activity.mark_dirty(day)
+        self.activity.prune()
+    
+    async def _get_previous_month(self, parser: Parser) -> Optional[Leaderboard]:
+        """Повертає попередній місяць із замороженого знімка, а завантажує його тільки після зміни місяця; None - не вдалося"""
+        month_key = Tools.get_month_key(1)
+        frozen = self.archive.load(month_key, required_servers=Settings.SERVER_IDS)
+        if frozen is not None:
+            return frozen
+        
+        log.info("🦍 No frozen snapshot for %s, fetching previous month data...", month_key)
+        server_status = {}
+        with refresh_phase_seconds.time(phase='previous_month_fetch'):
+            previous_data = await parser.fetch_and_parse_leaderboard(is_admin=True, is_current_month=False,
+                                                                     top_n=Settings.LEADERBOARD_STORE_N,
+                                                                     server_status=server_status)
+        if self._fetch_failed(server_status):
+            return None
+        previous_month = Leaderboard.from_players(previous_data)
+        
+        # Заморожуємо тільки повний топ: всі сервери відповіли і жоден не обрізаний лімітом сторінок
+        complete = bool(server_status) and all(status in COMPLETE_STATUSES for status in server_status.values())
+        if previous_data and not complete:
+            log.warning("🦍 Previous month fetch is incomplete (%s), not freezing %s", server_status, month_key)
+        
+        # Перші хвилини нового місяця Battlemetrics ще може дораховувати час, тому заморожуємо із запасом
+        if previous_data and complete and Tools.seconds_since_month_start() >= Settings.MONTH_FREEZE_GRACE:
+            self.archive.save(month_key, previous_month, servers=server_status)
+            # Фінальний знімок закритого місяця в історії
+            self._record_history(previous_month.admin_view(), month_key=month_key, force=True)
+        
+        return previous_month
+    
+    async def _record_generation_history(self, generation: CacheGeneration):
+        if self.read_only:
+            # Історію пише фетчер - бот-споживачі її тільки читають
+            return
+        self._record_history(generation.current_month.admin_view())
+    
+    def _record_history(self, players: LeaderboardView, month_key: Optional[str] = None, force: bool = False):
+        """Додає знімок в історію; помилка історії не повинна ламати оновлення кешу"""
+        month_key = month_key or Tools.get_month_key()
+        breakdown = None
+        if Settings.INCREMENTAL_REFRESH and self.totals.month_key == month_key:
+            breakdown = self.totals.totals
+        
+        try:
+            self.history.record(month_key, players, breakdown=breakdown, force=force)
+        except Exception as e:
+            log.exception("🦍 Error writing history snapshot: %s", e)
     
-    def get_current_month_data(self, with_steam_id: bool = False) -> List[Player]:
+    def snapshot_document(self) -> dict:
+        generation = self.generation
+        return {
+            'generation': generation.number,
+            'current_month': Tools.get_month_key(),
+            'previous_month': Tools.get_month_key(1),
+            'last_update': generation.built_at.isoformat() if generation.built_at else None,
+            'current_month_board': generation.current_month.to_dict(),
+            'previous_month_board': generation.previous_month.to_dict()
+        }
+    
+    async def save_snapshot(self):
+        """Атомарно записує поточне покоління на диск для швидкого старту (серіалізація і запис - в пулі воркерів)"""
+        generation = self.generation
+        try:
+            await self.pool.run('serialize', Tools.atomic_write_json, Settings.CACHE_SNAPSHOT_PATH, self.snapshot_document(),
+                                items=len(generation.current_month) + len(generation.previous_month))
+        except OSError as e:
+            log.error("🦍 Could not write cache snapshot: %s", e)
+    
+    def load_snapshot(self) -> bool:
+        """Завантажує знімок кешу з диску (до підключення до Discord)"""
+        path = Settings.CACHE_SNAPSHOT_PATH
+        if not os.path.exists(path):
+            log.info("🦍 No cache snapshot on disk, starting cold")
+            return False
+        
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning("🦍 Could not read cache snapshot: %s", e)
+            return False
+        
+        # Якщо з моменту знімка змінився місяць - старі дані вже не про той місяць
+        current_month = Leaderboard.empty()
+        previous_month = Leaderboard.empty()
+        try:
+            if data.get('current_month') == Tools.get_month_key():
+                current_month = Leaderboard.from_dict(data['current_month_board'])
+            if data.get('previous_month') == Tools.get_month_key(1):
+                previous_month = Leaderboard.from_dict(data['previous_month_board'])
+            built_at = datetime.fromisoformat(data['last_update']) if data.get('last_update') else None
+            number = int(data.get('generation', 0))
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            # AttributeError - документ не словник (наприклад, обрізаний або чужий файл)
+            log.warning("🦍 Cache snapshot has unexpected format: %s", e)
+            return False
+        
+        self.generation = CacheGeneration(number, current_month, previous_month, built_at)
+        
+        log.info("🦍 Loaded cache snapshot generation %d from %s: %d current, %d previous players",
+                 self.generation.number, self.last_update, len(self.current_month_data), len(self.previous_month_data))
+        return True
+    
+    def adopt_snapshot(self) -> bool:
+        """Режим consumer: підхоплює покоління, записане фетчером, і сповіщає підписників (embed, автотоп, індекс)"""
+        previous = self.generation.number
+        if not self.load_snapshot() or self.generation.number == previous:
+            return False
+        self.generation_events.publish(self.generation)
+        return True
+    
+    def get_current_month_data(self, with_steam_id: bool = False) -> LeaderboardView:
         """Повертає дані поточного місяця"""
         if with_steam_id:
-            return self.current_month_data
+            return self.generation.current_month.admin_view()
         else:
-            # Повертаємо копію без Steam ID для публічних команд
-            return [Player(p.name, p.id, p.value) for p in self.current_month_data]
+            # Публічна проекція без Steam ID - без копіювання списку
+            return self.generation.current_month.public_view()
     
-    def get_previous_month_data(self) -> List[Player]:
+    def get_previous_month_data(self) -> LeaderboardView:
         """Повертає дані попереднього місяця"""
         return self.previous_month_data
     
@@ -74,17 +382,19 @@ class DataCache:
     
     def get_cache_status(self) -> str:
         """Повертає статус кешу"""
-        if not self.last_update:
+        generation = self.generation
+        if not generation.built_at:
             return "🦍 Дані не шось завантажені"
         
-        age = datetime.now(timezone.utc) - self.last_update
-        age_minutes = int(age.total_seconds() / 60)
+        age_minutes = int(generation.age_seconds() / 60)
         
         status = "🦍 Свіжі" if self.is_data_fresh() else "🦍 не такі уж і свіжі"
-        current_count = len(self.current_month_data)
-        previous_count = len(self.previous_month_data)
+        current_count = len(generation.current_month)
+        previous_count = len(generation.previous_month)
+        updating = "\n🔄 Зараз іде оновлення" if self.is_updating else ""
         
-        return f"{status} (оновлено {age_minutes} хв тому)\n📊 Поточний місяць: {current_count} гравців\n📊 Попередній місяць: {previous_count} гравців"
+        return (f"{status} (покоління #{generation.number}, оновлено {age_minutes} хв тому)\n"
+                f"📊 Поточний місяць: {current_count} гравців\n📊 Попередній місяць: {previous_count} гравців{updating}")
 
 # Глобальний екземпляр кешу
 data_cache = DataCache()
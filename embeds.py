@@ -0,0 +1,214 @@
+import discord
+import hashlib
+import json
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from settings import Settings
+from tools import Tools
+from data_cache import DataCache, CacheGeneration, data_cache
+from metrics import metrics, refresh_phase_seconds, set_cache_lookups
+
+# Ліміт опису embed в Discord - 4096, залишаємо трохи місця
+EMBED_DESCRIPTION_LIMIT = 4000
+
+def format_leaderboard_line(rank: int, player, is_admin: bool) -> str:
+    if is_admin:
+        return f"{rank}. **{player.steam_id}** **{player.name}**: {Tools.format_time(player.value)}"
+    return f"{rank}. **{player.name}**: {Tools.format_time(player.value)}"
+
+def create_leaderboard_page_embed(players_list, page: int, page_size: int, is_admin: bool = False,
+                                  title_suffix: str = "", updated_at: Optional[datetime] = None) -> discord.Embed:
+    """Створює embed однієї сторінки лідерборду (players_list - вже обрізаний до K гравців)"""
+    total = len(players_list)
+    page_count = max(1, -(-total // page_size))
+    start = page * page_size
+    # LeaderboardView ріже без копіювання - рядки створюються тільки для цієї сторінки
+    lines = [format_leaderboard_line(start + i + 1, player, is_admin)
+             for i, player in enumerate(players_list[start:start + page_size])]
+
+    embed = discord.Embed(
+        title=f"Top {total} Online — SQUAD UKRAINE{title_suffix}",
+        description="\n".join(lines) or "🦍 Тут порожньо",
+        color=discord.Color.blue(),
+        timestamp=updated_at or datetime.now(timezone.utc)
+    )
+    footer = f"🦍 Сторінка {page + 1}/{page_count} · місця {start + 1}-{start + len(lines)} з {total}"
+    if updated_at:
+        footer += f" · Оновлено: {updated_at.strftime('%H:%M:%S UTC')}"
+    embed.set_footer(text=footer)
+    return embed
+
+def create_player_embed(entry, is_admin: bool = False, updated_at: Optional[datetime] = None) -> discord.Embed:
+    """Створює embed картки гравця: місце і час за поточний і попередній місяць та різниця"""
+    def month_line(rank: Optional[int], seconds: int) -> str:
+        return f"#{rank} — {Tools.format_time(seconds)}" if rank else "не в топі"
+
+    embed = discord.Embed(
+        title=f"🦍 {entry.name}",
+        color=discord.Color.blue(),
+        timestamp=updated_at or datetime.now(timezone.utc)
+    )
+    embed.add_field(name="Цей місяць", value=month_line(entry.current_rank, entry.current_value), inline=True)
+    embed.add_field(name="Попередній місяць", value=month_line(entry.previous_rank, entry.previous_value), inline=True)
+
+    sign = '+' if entry.delta >= 0 else '-'
+    delta = f"{sign}{Tools.format_time(abs(entry.delta))}"
+    if entry.current_rank and entry.previous_rank and entry.current_rank != entry.previous_rank:
+        moved = entry.previous_rank - entry.current_rank
+        delta += f" ({'⬆️' if moved > 0 else '⬇️'} {abs(moved)} місць)"
+    embed.add_field(name="Різниця", value=delta, inline=False)
+
+    footer = f"Battlemetrics ID: {entry.player_id}"
+    if is_admin and entry.steam_id:
+        footer += f" · Steam ID: {entry.steam_id}"
+    embed.set_footer(text=footer)
+    return embed
+
+def create_leaderboard_embeds(players_list, is_admin: bool = False, title_suffix: str = "",
+                              updated_at: Optional[datetime] = None) -> List[discord.Embed]:
+    """Створює один embed для лідерборду з усіма гравцями"""
+    if not players_list:
+        return []
+
+    # Спробуємо показати всіх 100 гравців
+    display_players = players_list[:100]
+
+    lines = []
+    length = 0
+    shown = 0
+
+    for i, player in enumerate(display_players):
+        line = format_leaderboard_line(i + 1, player, is_admin)
+
+        # Перевіряємо чи не перевищуємо ліміт символів Discord (4096)
+        if length + len(line) + 1 > EMBED_DESCRIPTION_LIMIT:
+            lines.append(f"... та ще {len(players_list) - i} гравців")
+            break
+
+        lines.append(line)
+        length += len(line) + 1
+        shown += 1
+
+    embed = discord.Embed(
+        title=f"Top 100 Online — SQUAD UKRAINE{title_suffix}",
+        description="\n".join(lines),
+        color=discord.Color.blue(),
+        timestamp=updated_at or datetime.now(timezone.utc)
+    )
+
+    # Додаємо інформацію про кількість показаних гравців
+    embed.add_field(
+        name="🦍 Статистика",
+        value=f"Показано: {shown} з {len(players_list)} гравців",
+        inline=False
+    )
+
+    if updated_at:
+        embed.set_footer(text=f"🦍 Оновлено: {updated_at.strftime('%H:%M:%S UTC')}")
+
+    return [embed]
+
+def embed_content_hash(embed: discord.Embed) -> str:
+    """Хеш заголовка, опису і полів embed (timestamp і footer змінюються щоразу, тому не враховуються)"""
+    data = embed.to_dict()
+    data.pop('timestamp', None)
+    data.pop('footer', None)
+    return hashlib.sha1(json.dumps(data, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+class EmbedCache:
+    """Готові embed лідербордів, зібрані один раз на покоління кешу даних"""
+
+    # Вигляд -> (з Steam ID, суфікс заголовка, попередній місяць)
+    VIEWS = {
+        'public': (False, "", False),
+        'admin': (True, "", False),
+        'previous': (True, " (попередній місяць)", True),
+        'auto': (False, " 🦍", False),
+        'previous_public': (False, " (попередній місяць) 🦍", True)
+    }
+
+    def __init__(self, cache: DataCache):
+        self.cache = cache
+        self._generation = -1
+        self._embeds: Dict[str, Optional[discord.Embed]] = {}
+        self._hashes: Dict[str, Optional[str]] = {}
+        # (вигляд, K, сторінка) -> embed сторінки
+        self._pages: Dict[Tuple[str, int, int], discord.Embed] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, view: str) -> Optional[discord.Embed]:
+        """Повертає готовий embed для вигляду (None якщо даних немає)"""
+        generation = self._current_generation()
+        if view in self._embeds:
+            self.hits += 1
+            return self._embeds[view]
+
+        self.misses += 1
+        embed = self._render(generation, view)
+        self._embeds[view] = embed
+        return embed
+
+    def page(self, view: str, page: int, top_k: int = Settings.LEADERBOARD_TOP_N,
+             page_size: int = Settings.LEADERBOARD_PAGE_ROWS) -> Tuple[Optional[discord.Embed], int, int]:
+        """Повертає (embed сторінки, номер сторінки після обмеження, кількість сторінок); сторінки збираються при першому перегляді"""
+        generation = self._current_generation()
+        with_steam_id, title_suffix, previous = self.VIEWS[view]
+        board = generation.previous_month if previous else generation.current_month
+        total = min(top_k, len(board))
+        if with_steam_id:
+            # Steam ID відомі тільки для верхівки топу - глибше адмін-вигляд не показуємо
+            total = min(total, Settings.STEAM_ID_RESOLVE_N)
+        if not total:
+            return None, 0, 0
+
+        page_count = -(-total // page_size)
+        page = min(max(page, 0), page_count - 1)
+        key = (view, total, page)
+        embed = self._pages.get(key)
+        if embed is not None:
+            self.hits += 1
+            return embed, page, page_count
+
+        self.misses += 1
+        players_list = (board.admin_view() if with_steam_id else board.public_view())[:total]
+        embed = create_leaderboard_page_embed(players_list, page, page_size, is_admin=with_steam_id,
+                                              title_suffix=title_suffix, updated_at=generation.built_at)
+        self._pages[key] = embed
+        return embed, page, page_count
+
+    def _current_generation(self) -> CacheGeneration:
+        """Поточне покоління; якщо воно змінилось - все зібране раніше вже неактуальне"""
+        generation = self.cache.snapshot()
+        if generation.number != self._generation:
+            self._embeds = {}
+            self._hashes = {}
+            self._pages = {}
+            self._generation = generation.number
+        return generation
+
+    def content_hash(self, view: str) -> Optional[str]:
+        """Хеш видимого вмісту embed (без часу оновлення) - щоб не редагувати однакові повідомлення"""
+        embed = self.get(view)
+        if view not in self._hashes:
+            self._hashes[view] = embed_content_hash(embed) if embed else None
+        return self._hashes[view]
+
+    def prewarm(self):
+        """Збирає всі вигляди для поточного покоління одразу"""
+        with refresh_phase_seconds.time(phase='render'):
+            for view in self.VIEWS:
+                self.get(view)
+
+    def _render(self, generation: CacheGeneration, view: str) -> Optional[discord.Embed]:
+        with_steam_id, title_suffix, previous = self.VIEWS[view]
+        board = generation.previous_month if previous else generation.current_month
+        # Одиночні embed (автооновлення, сумісність) - тільки класичний топ 100
+        players_list = (board.admin_view() if with_steam_id else board.public_view())[:Settings.LEADERBOARD_TOP_N]
+        embeds = create_leaderboard_embeds(players_list, is_admin=with_steam_id, title_suffix=title_suffix,
+                                           updated_at=generation.built_at)
+        return embeds[0] if embeds else None
+
+# Глобальний кеш готових embed
+embed_cache = EmbedCache(data_cache)
+metrics.add_collector(lambda: set_cache_lookups('embed', embed_cache.hits, embed_cache.misses))
@@ -0,0 +1,38 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Set
+
+log = logging.getLogger(__name__)
+
+Handler = Callable[..., Awaitable[Any]]
+
+class EventBus:
+    """Мінімальний pub/sub: кожен підписник отримує подію у своїй задачі, помилки не зачіпають інших"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._handlers: List[Handler] = []
+        # Тримаємо посилання на задачі, інакше їх може прибрати збирач сміття
+        self._tasks: Set[asyncio.Task] = set()
+
+    def subscribe(self, handler: Handler) -> Handler:
+        """Додає async-обробник; можна використовувати як декоратор"""
+        self._handlers.append(handler)
+        return handler
+
+    def unsubscribe(self, handler: Handler):
+        if handler in self._handlers:
+            self._handlers.remove(handler)
+
+    def publish(self, *args: Any):
+        """Запускає всіх підписників і не чекає на них"""
+        for handler in list(self._handlers):
+            task = asyncio.create_task(self._run(handler, *args))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, handler: Handler, *args: Any):
+        try:
+            await handler(*args)
+        except Exception as e:
+            log.exception("🦍 Error in %s subscriber %s: %s", self.name, getattr(handler, '__name__', handler), e)
@@ -0,0 +1,69 @@
+"""Окремий процес-фетчер: оновлює дані з Battlemetrics і публікує знімки для ботів з BOT_MODE=consumer
+
+Скільки б бот-процесів не працювало, запити до API робить тільки фетчер. Боти читають
+cache_snapshot.json (а також історію, накопичені суми і денну активність) зі спільного DATA_DIR
+і отримують сповіщення про нове покоління через Unix-сокет SNAPSHOT_SOCKET.
+
+Запуск: python fetcher.py
+"""
+import asyncio
+import logging
+from dotenv import load_dotenv
+
+# .env має бути прочитаний до імпорту settings - інакше Settings заморозить значення без нього
+load_dotenv()
+
+from settings import Settings
+from data_cache import data_cache
+from steam_id_cache import steam_id_cache
+from history_store import history_store
+from bm_client import bm_client
+from refresh_scheduler import refresh_scheduler
+from snapshot_feed import snapshot_publisher
+from metrics import loop_lag_monitor, metrics_exporter
+from worker_pool import worker_pool
+
+logging.basicConfig(
+    level=getattr(logging, Settings.LOG_LEVEL, logging.INFO),
+    format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+)
+log = logging.getLogger('squadbot.fetcher')
+
+async def refresh_loop():
+    """Той самий цикл, що й data_updater у боті: оновлення, потім інтервал від refresh_scheduler"""
+    while True:
+        try:
+            await data_cache.update_data()
+        except Exception as e:
+            log.exception("Error in data updater: %s", e)
+
+        try:
+            interval = await refresh_scheduler.schedule(data_cache.snapshot())
+        except Exception as e:
+            log.exception("Error in refresh scheduling: %s", e)
+            interval = Settings.DATA_UPDATE_INTERVAL
+        await asyncio.sleep(interval)
+
+async def main():
+    log.info("🦍 Starting fetcher...")
+    log.info("BM token present: %s", bool(Settings.TOKEN_BM))
+
+    steam_id_cache.load()
+    history_store.load()
+    # Номер покоління продовжується зі знімка - боти бачать, що дані новіші
+    data_cache.load_snapshot()
+
+    loop_lag_monitor.start()
+    await metrics_exporter.start()
+    await snapshot_publisher.start()
+    try:
+        await refresh_loop()
+    finally:
+        await snapshot_publisher.stop()
+        await metrics_exporter.stop()
+        loop_lag_monitor.stop()
+        await bm_client.close()
+        worker_pool.shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,158 @@
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional, Tuple
+from settings import Settings
+
+log = logging.getLogger(__name__)
+
+# Рядки з server_id = 0 - сума по всіх серверах (тільки в них заповнений rank)
+TOTAL_SERVER_ID = 0
+
+class HistoryStore:
+    """Історія лідерборду: знімки (player_id, server, month, seconds) в SQLite з індексами по гравцю і місяцю"""
+
+    def __init__(self, path: str, min_interval: int = Settings.HISTORY_MIN_INTERVAL):
+        self.path = path
+        self.min_interval = min_interval
+        self._conn: Optional[sqlite3.Connection] = None
+        # Останнє записане значення (seconds, rank) для (month, player_id, server_id) - пишемо тільки зміни
+        self._last: Dict[Tuple[str, int, int], Tuple[int, int]] = {}
+        self._last_snapshot_at: Dict[str, float] = {}
+
+    def load(self):
+        """Відкриває базу, створює схему і відновлює останні записані значення"""
+        if self._conn is not None:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.path)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            "  id INTEGER PRIMARY KEY, taken_at REAL NOT NULL, month TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS history ("
+            "  snapshot_id INTEGER NOT NULL, month TEXT NOT NULL, player_id INTEGER NOT NULL,"
+            "  server_id INTEGER NOT NULL, seconds INTEGER NOT NULL, rank INTEGER);"
+            "CREATE TABLE IF NOT EXISTS names ("
+            "  player_id INTEGER PRIMARY KEY, name TEXT NOT NULL, folded TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS history_by_player ON history (player_id, server_id, month, snapshot_id);"
+            "CREATE INDEX IF NOT EXISTS history_by_month ON history (month, server_id, player_id, snapshot_id);"
+            "CREATE INDEX IF NOT EXISTS names_by_folded ON names (folded);"
+        )
+        self._conn.commit()
+
+        for month, taken_at in self._conn.execute("SELECT month, MAX(taken_at) FROM snapshots GROUP BY month"):
+            self._last_snapshot_at[month] = taken_at
+        for month, player_id, server_id, seconds, rank, _ in self._conn.execute(
+            "SELECT month, player_id, server_id, seconds, rank, MAX(snapshot_id) FROM history "
+            "GROUP BY month, player_id, server_id"
+        ):
+            self._last[(month, player_id, server_id)] = (seconds, rank)
+
+    def record(self, month: str, players: List, breakdown: Optional[Dict[int, Dict[int, int]]] = None,
+               force: bool = False) -> bool:
+        """Записує знімок лідерборду місяця (тільки рядки що змінились з попереднього знімка)
+
+        players - відсортований топ (об'єкти з id, name, value),
+        breakdown - необов'язковий розподіл часу гравця по серверах {player_id: {server_id: seconds}}.
+        """
+        self.load()
+        now = time.time()
+        if not force and now - self._last_snapshot_at.get(month, 0) < self.min_interval:
+            return False
+
+        rows = []
+        for rank, player in enumerate(players, start=1):
+            values = [(TOTAL_SERVER_ID, player.value, rank)]
+            if breakdown and player.id in breakdown:
+                values.extend((server_id, seconds, None) for server_id, seconds in breakdown[player.id].items())
+
+            for server_id, seconds, row_rank in values:
+                key = (month, player.id, server_id)
+                if self._last.get(key) != (seconds, row_rank):
+                    rows.append((month, player.id, server_id, seconds, row_rank))
+
+        self._last_snapshot_at[month] = now
+        if not rows:
+            return False
+
+        cursor = self._conn.execute("INSERT INTO snapshots (taken_at, month) VALUES (?, ?)", (now, month))
+        snapshot_id = cursor.lastrowid
+        self._conn.executemany(
+            "INSERT INTO history (snapshot_id, month, player_id, server_id, seconds, rank) VALUES (?, ?, ?, ?, ?, ?)",
+            [(snapshot_id, *row) for row in rows]
+        )
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO names (player_id, name, folded) VALUES (?, ?, ?)",
+            [(player.id, player.name, player.name.casefold()) for player in players]
+        )
+        self._conn.commit()
+
+        for row_month, player_id, server_id, seconds, row_rank in rows:
+            self._last[(row_month, player_id, server_id)] = (seconds, row_rank)
+        log.info("🦍 History snapshot %s for %s: %d changed rows", snapshot_id, month, len(rows))
+        return True
+
+    def find_player(self, query: str) -> Optional[Tuple[int, str]]:
+        """Шукає гравця за ID або за ніком (спочатку точний збіг, потім частковий)"""
+        self.load()
+        if query.isdigit():
+            row = self._conn.execute("SELECT player_id, name FROM names WHERE player_id = ?", (int(query),)).fetchone()
+            if row:
+                return row
+
+        # SQLite порівнює без регістру тільки латиницю, тому шукаємо по casefold() копії ніка
+        folded = query.casefold()
+        row = self._conn.execute(
+            "SELECT player_id, name FROM names WHERE folded = ? LIMIT 1", (folded,)
+        ).fetchone()
+        if row:
+            return row
+        return self._conn.execute(
+            "SELECT player_id, name FROM names WHERE instr(folded, ?) > 0 LIMIT 1", (folded,)
+        ).fetchone()
+
+    def player_history(self, player_id: int) -> List[Tuple[str, int, Optional[int]]]:
+        """Підсумок гравця по місяцях: (month, seconds, rank) з останнього знімка кожного місяця"""
+        self.load()
+        rows = self._conn.execute(
+            "SELECT month, seconds, rank, MAX(snapshot_id) FROM history "
+            "WHERE player_id = ? AND server_id = ? GROUP BY month ORDER BY month DESC",
+            (player_id, TOTAL_SERVER_ID)
+        ).fetchall()
+        return [(month, seconds, rank) for month, seconds, rank, _ in rows]
+
+    def month_top(self, month: str, limit: int = 100) -> List[Tuple[int, str, int]]:
+        """Топ місяця за останніми записаними значеннями: (player_id, name, seconds)"""
+        self.load()
+        rows = self._conn.execute(
+            "SELECT h.player_id, COALESCE(n.name, ''), h.seconds FROM ("
+            "  SELECT player_id, seconds, MAX(snapshot_id) FROM history"
+            "  WHERE month = ? AND server_id = ? GROUP BY player_id"
+            ") AS h LEFT JOIN names AS n ON n.player_id = h.player_id "
+            "ORDER BY h.seconds DESC LIMIT ?",
+            (month, TOTAL_SERVER_ID, limit)
+        ).fetchall()
+        return rows
+
+    def rank_trajectory(self, player_id: int, month: str) -> List[Tuple[float, int, int]]:
+        """Як змінювалось місце гравця протягом місяця: (taken_at, rank, seconds)"""
+        self.load()
+        return self._conn.execute(
+            "SELECT s.taken_at, h.rank, h.seconds FROM history AS h "
+            "JOIN snapshots AS s ON s.id = h.snapshot_id "
+            "WHERE h.player_id = ? AND h.server_id = ? AND h.month = ? ORDER BY h.snapshot_id",
+            (player_id, TOTAL_SERVER_ID, month)
+        ).fetchall()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+# Глобальне сховище історії
+history_store = HistoryStore(Settings.HISTORY_DB_PATH)
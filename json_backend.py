@@ -0,0 +1,89 @@
+import json
+import logging
+from typing import Any, List, Optional, Tuple
+from settings import Settings
+from aggregator import Row
+
+log = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # orjson необов'язковий - без нього працює стандартний json
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # msgspec необов'язковий - без нього сторінки розбираються через loads
+    msgspec = None
+
+def _pick_backend(preferred: str) -> str:
+    available = {'msgspec': msgspec is not None, 'orjson': orjson is not None, 'stdlib': True}
+    if preferred != 'auto':
+        if available.get(preferred):
+            return preferred
+        log.warning("JSON backend %s is not installed, choosing automatically", preferred)
+    for name in ('msgspec', 'orjson', 'stdlib'):
+        if available[name]:
+            return name
+    return 'stdlib'
+
+BACKEND = _pick_backend(Settings.JSON_BACKEND)
+
+if BACKEND == 'msgspec':
+    loads = msgspec.json.decode
+elif BACKEND == 'orjson':
+    loads = orjson.loads
+else:
+    loads = json.loads
+
+if msgspec is not None:
+    # Типізована схема сторінки лідерборду: msgspec декодує одразу в ці структури,
+    # пропускаючи всі поля, яких тут немає (без проміжних словників)
+    class _Attributes(msgspec.Struct, frozen=True):
+        name: str = ''
+        value: int = 0
+
+    class _Entry(msgspec.Struct):
+        id: int = 0
+        attributes: _Attributes = _Attributes()
+
+    class _Links(msgspec.Struct, frozen=True):
+        next: Optional[str] = None
+
+    class _Page(msgspec.Struct):
+        data: List[_Entry] = []
+        links: _Links = _Links()
+
+    # strict=False - Battlemetrics віддає id рядком, а value інколи теж
+    _page_decoder = msgspec.json.Decoder(_Page, strict=False)
+
+def decode_leaderboard_page(body: bytes) -> Tuple[List[Row], Optional[str]]:
+    """Розбирає сторінку лідерборду в рядки (player_id, name, value) і посилання на наступну сторінку"""
+    if BACKEND == 'msgspec':
+        try:
+            page = _page_decoder.decode(body)
+        except msgspec.ValidationError as e:
+            # Хоч один рядок не за схемою - розбираємо сторінку поштучно, пропускаючи погані рядки
+            log.debug("Leaderboard page does not match schema (%s), decoding generically", e)
+        else:
+            rows = [(entry.id, entry.attributes.name, entry.attributes.value)
+                    for entry in page.data
+                    if entry.id and entry.attributes.name and entry.attributes.value]
+            return rows, page.links.next
+
+    return _rows_from_document(loads(body))
+
+def _rows_from_document(data: Any) -> Tuple[List[Row], Optional[str]]:
+    rows = []
+    for user_data in data.get('data') or []:
+        try:
+            attributes = user_data.get('attributes') or {}
+            player_id = int(user_data.get('id', '0'))
+            name = attributes.get('name', '')
+            value = int(attributes.get('value', '0'))
+        except (ValueError, TypeError) as e:
+            log.debug("Error parsing player data: %s", e)
+            continue
+        if player_id and name and value:
+            rows.append((player_id, name, value))
+    return rows, (data.get('links') or {}).get('next')
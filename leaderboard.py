@@ -0,0 +1,96 @@
+import sys
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Union
+from parser import Player
+
+class Leaderboard:
+    """Компактний відсортований лідерборд: паралельні масиви замість списку об'єктів"""
+
+    __slots__ = ('ids', 'values', 'steam_ids', 'names')
+
+    def __init__(self, ids: array, values: array, steam_ids: array, names: List[str]):
+        self.ids = ids
+        self.values = values
+        self.steam_ids = steam_ids
+        self.names = names
+
+    @classmethod
+    def empty(cls) -> 'Leaderboard':
+        return cls(array('q'), array('q'), array('q'), [])
+
+    @classmethod
+    def from_players(cls, players: Iterable[Player]) -> 'Leaderboard':
+        board = cls.empty()
+        for player in players:
+            board.ids.append(player.id)
+            board.values.append(player.value)
+            board.steam_ids.append(player.steam_id)
+            # Один і той самий нік у різних місяцях/поколіннях зберігається один раз
+            board.names.append(sys.intern(player.name))
+        return board
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Leaderboard':
+        return cls(
+            array('q', data['ids']),
+            array('q', data['values']),
+            array('q', data['steam_ids']),
+            [sys.intern(name) for name in data['names']]
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'ids': self.ids.tolist(),
+            'values': self.values.tolist(),
+            'steam_ids': self.steam_ids.tolist(),
+            'names': self.names
+        }
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def public_view(self) -> 'LeaderboardView':
+        """Проекція без Steam ID для публічних команд (без копіювання даних)"""
+        return LeaderboardView(self, False, 0, len(self.ids))
+
+    def admin_view(self) -> 'LeaderboardView':
+        """Проекція з Steam ID (без копіювання даних)"""
+        return LeaderboardView(self, True, 0, len(self.ids))
+
+class LeaderboardView(Sequence):
+    """Тільки для читання: діапазон лідерборду, рядки якого створюються при доступі"""
+
+    __slots__ = ('board', 'with_steam_id', 'start', 'stop')
+
+    def __init__(self, board: Leaderboard, with_steam_id: bool, start: int, stop: int):
+        self.board = board
+        self.with_steam_id = with_steam_id
+        self.start = start
+        self.stop = stop
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Player, 'LeaderboardView']:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("LeaderboardView supports only contiguous slices")
+            return LeaderboardView(self.board, self.with_steam_id, self.start + start, self.start + max(start, stop))
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._row(self.start + index)
+
+    def __iter__(self) -> Iterator[Player]:
+        for position in range(self.start, self.stop):
+            yield self._row(position)
+
+    def _row(self, position: int) -> Player:
+        board = self.board
+        player = Player(board.names[position], board.ids[position], board.values[position])
+        if self.with_steam_id:
+            player.steam_id = board.steam_ids[position]
+        return player
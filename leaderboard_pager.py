@@ -0,0 +1,95 @@
+import logging
+import discord
+from typing import Optional
+from settings import Settings
+from embeds import EmbedCache, embed_cache
+
+log = logging.getLogger(__name__)
+
+class JumpToPageModal(discord.ui.Modal, title="Перейти до сторінки"):
+    """Модальне вікно: номер сторінки або місце в топі (#150)"""
+
+    target = discord.ui.TextInput(label="Сторінка або місце (#150)", placeholder="3 або #150", max_length=8)
+
+    def __init__(self, pager: 'LeaderboardPager'):
+        super().__init__()
+        self.pager = pager
+
+    async def on_submit(self, interaction: discord.Interaction):
+        value = self.target.value.strip()
+        try:
+            if value.startswith('#'):
+                page = (int(value[1:]) - 1) // self.pager.page_size
+            else:
+                page = int(value) - 1
+        except ValueError:
+            await interaction.response.send_message("🦍 Це не схоже на номер сторінки", ephemeral=True)
+            return
+        await self.pager.show(interaction, page)
+
+class LeaderboardPager(discord.ui.View):
+    """Кнопки гортання топу; сторінки беруться з EmbedCache (зібрані один раз на покоління)"""
+
+    def __init__(self, owner_id: int, view: str, top_k: int, embeds: EmbedCache = embed_cache,
+                 page_size: int = Settings.LEADERBOARD_PAGE_ROWS):
+        super().__init__(timeout=Settings.LEADERBOARD_PAGER_TIMEOUT)
+        self.owner_id = owner_id
+        self.view_name = view
+        self.top_k = top_k
+        self.embeds = embeds
+        self.page_size = page_size
+        self.page = 0
+        self.page_count = 0
+        self.message: Optional[discord.InteractionMessage] = None
+
+    def render(self, page: int) -> Optional[discord.Embed]:
+        """Повертає embed сторінки і оновлює стан кнопок"""
+        embed, self.page, self.page_count = self.embeds.page(self.view_name, page, self.top_k, self.page_size)
+        self.first_page.disabled = self.previous_page.disabled = self.page <= 0
+        self.next_page.disabled = self.last_page.disabled = self.page >= self.page_count - 1
+        self.jump_to.disabled = self.page_count <= 1
+        return embed
+
+    async def show(self, interaction: discord.Interaction, page: int):
+        embed = self.render(page)
+        if embed is None:
+            await interaction.response.send_message("🦍 Дані зникли з кешу, спробуй команду ще раз", ephemeral=True)
+            return
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # Гортати може тільки той, хто викликав команду - інакше всі б гортали одне повідомлення
+        if interaction.user.id == self.owner_id:
+            return True
+        await interaction.response.send_message("🦍 Виклич свою команду і гортай скільки завгодно", ephemeral=True)
+        return False
+
+    async def on_timeout(self):
+        if self.message is None:
+            return
+        for item in self.children:
+            item.disabled = True
+        try:
+            await self.message.edit(view=self)
+        except discord.HTTPException as e:
+            log.debug("Could not disable pager buttons: %s", e)
+
+    @discord.ui.button(emoji="⏮️", style=discord.ButtonStyle.secondary)
+    async def first_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show(interaction, 0)
+
+    @discord.ui.button(emoji="◀️", style=discord.ButtonStyle.primary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show(interaction, self.page - 1)
+
+    @discord.ui.button(emoji="▶️", style=discord.ButtonStyle.primary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show(interaction, self.page + 1)
+
+    @discord.ui.button(emoji="⏭️", style=discord.ButtonStyle.secondary)
+    async def last_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show(interaction, self.page_count - 1)
+
+    @discord.ui.button(label="Перейти…", style=discord.ButtonStyle.secondary)
+    async def jump_to(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.send_modal(JumpToPageModal(self))
@@ -2,68 +2,99 @@ import discord
 from discord.ext import commands, tasks
 from discord import app_commands
 import asyncio
+import logging
 import os
 import random
 from datetime import datetime, timezone
+from typing import Optional
 from dotenv import load_dotenv
 from settings import Settings
 from tools import Tools
 from data_cache import data_cache
+from embeds import create_leaderboard_embeds, create_player_embed, embed_cache
+from parser import Player
+from steam_id_cache import steam_id_cache
+from bm_client import bm_client
+from history_store import history_store
+from month_archive import month_archive
+from subscriptions import Subscription, subscription_registry
+from auto_top import auto_top_scheduler
+from leaderboard_pager import LeaderboardPager
+from player_index import player_index
+from running_totals import running_totals
+from activity_aggregates import activity_aggregates
+from refresh_scheduler import refresh_scheduler
+from metrics import command_errors, command_seconds, loop_lag_monitor, metrics_exporter
+from worker_pool import worker_pool
+from snapshot_feed import snapshot_follower
 
 load_dotenv()
 
+logging.basicConfig(
+    level=getattr(logging, Settings.LOG_LEVEL, logging.INFO),
+    format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+)
+log = logging.getLogger('squadbot')
+
 class SquadBot(commands.Bot):
     def __init__(self):
         intents = discord.Intents.none()
         intents.guilds = True
         super().__init__(command_prefix='!', intents=intents)
-        self.auto_update_message_id = None
         
     async def setup_hook(self):
-        print("Setting up bot...")
+        log.info("Setting up bot...")
         try:
             # Синхронізуємо команди
-            print("Syncing commands...")
             synced = await self.tree.sync()
-            print(f"Synced {len(synced)} slash commands")
+            log.info("Synced %d slash commands", len(synced))
             
             # Виводимо список команд для діагностики
             for command in synced:
-                print(f"  - {command.name}: {command.description}")
+                log.debug("  - %s: %s", command.name, command.description)
                 
         except Exception as e:
-            print(f"Failed to sync commands: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Failed to sync commands: %s", e)
         
-        print("Setup hook completed")
+        # Метрики і моніторинг event loop працюють незалежно від Discord
+        loop_lag_monitor.start()
+        await metrics_exporter.start()
+        log.info("Setup hook completed")
+    
+    async def close(self):
+        # Закриваємо пул з'єднань Battlemetrics разом з ботом
+        await bm_client.close()
+        loop_lag_monitor.stop()
+        await metrics_exporter.stop()
+        worker_pool.shutdown()
+        snapshot_follower.stop()
+        await super().close()
+    
+    async def on_app_command_completion(self, interaction: discord.Interaction, command):
+        # Від створення взаємодії в Discord до завершення обробника
+        latency = (datetime.now(timezone.utc) - interaction.created_at).total_seconds()
+        command_seconds.observe(latency, command=command.qualified_name)
+        log.debug("Command /%s completed in %.3fs", command.qualified_name, latency)
         
     async def on_ready(self):
-        print(f'🦍 {self.user} has connected to Discord!')
-        print(f'🦍 Bot is in {len(self.guilds)} guilds')
+        log.info('🦍 %s has connected to Discord!', self.user)
+        log.info('🦍 Bot is in %d guilds', len(self.guilds))
         
-        # Запускаємо фонові задачі після підключення
+        # Запускаємо фонові задачі після підключення.
+        # Перше оновлення робить data_updater у фоні, а поки що відповідаємо зі знімка з диску
         try:
-            if not data_updater.is_running():
-                print("🦍 Starting data updater...")
+            if Settings.BOT_MODE == 'consumer':
+                # Дані тягне fetcher.py - бот тільки підхоплює його знімки
+                log.info("🦍 Consumer mode: following snapshots instead of fetching")
+                snapshot_follower.start()
+            elif not data_updater.is_running():
+                log.info("🦍 Starting data updater...")
                 data_updater.start()
             else:
-                print("🦍 Data updater already running")
-            
-            if not auto_update_top.is_running():
-                print("🦍 Starting auto update...")
-                auto_update_top.start()
-            else:
-                print("🦍 Auto update already running")
-                
-            # Ініціалізуємо дані при старті
-            print("🦍 Doing initial data update...")
-            await data_cache.update_data()
+                log.info("🦍 Data updater already running")
             
         except Exception as e:
-            print(f"Error starting background tasks: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Error starting background tasks: %s", e)
 
 bot = SquadBot()
 
@@ -75,70 +106,64 @@ def is_allowed_user():
 
 # Видаляємо is_admin_user декоратор - більше не потрібен, використовуємо тільки is_allowed_user
 
-@bot.tree.command(name="top", description="Топ 100 онлайн за поточний місяць (нік + час)")
+async def send_leaderboard(interaction: discord.Interaction, view: str, top_k: Optional[int], page: Optional[int],
+                           empty_text: str):
+    """Відправляє сторінку топу з кнопками гортання (embed сторінок береться з кешу покоління)"""
+    pager = LeaderboardPager(interaction.user.id, view, top_k or Settings.LEADERBOARD_TOP_N)
+    embed = pager.render((page or 1) - 1)
+    
+    if not embed:
+        status = data_cache.get_cache_status()
+        await interaction.edit_original_response(content=f"{empty_text}\n{status}")
+        return
+    
+    # Одна сторінка - кнопки не потрібні
+    await interaction.edit_original_response(content=None, embed=embed, view=pager if pager.page_count > 1 else None)
+    if pager.page_count > 1:
+        pager.message = await interaction.original_response()
+
+TopSize = app_commands.Range[int, 1, Settings.LEADERBOARD_STORE_N]
+PageNumber = app_commands.Range[int, 1, 1000]
+
+@bot.tree.command(name="top", description="Топ онлайн за поточний місяць (нік + час), з гортанням сторінок")
+@app_commands.describe(k="Скільки гравців у топі (за замовчуванням 100)", page="З якої сторінки почати")
 @is_allowed_user()
-async def top_command(interaction: discord.Interaction):
+async def top_command(interaction: discord.Interaction, k: Optional[TopSize] = None, page: Optional[PageNumber] = None):
     await interaction.response.send_message("🦍 Завантажую дані з кешу, тримайся хлопець...", ephemeral=False)
     
     try:
-        players_list = data_cache.get_current_month_data(with_steam_id=False)
-        
-        if not players_list:
-            status = data_cache.get_cache_status()
-            await interaction.edit_original_response(content=f"🦍 Немає даних в кеші, щось пішло не так.\n{status}")
-            return
-        
-        embeds = create_leaderboard_embeds(players_list, is_admin=False, title_suffix="")
-        
-        # Надсилаємо один embed
-        await interaction.edit_original_response(content=None, embed=embeds[0])
+        await send_leaderboard(interaction, 'public', k, page, "🦍 Немає даних в кеші, щось пішло не так.")
             
     except Exception as e:
-        print(f"Error in top command: {e}")
+        log.exception("Error in top command: %s", e)
         await interaction.edit_original_response(content="🦍 Ой, щось зламалось при отриманні даних. Спробуй ще раз!")
 
-@bot.tree.command(name="topad", description="Топ 100 онлайн за поточний місяць (Steam ID + нік + час)")
+@bot.tree.command(name="topad", description="Топ онлайн за поточний місяць (Steam ID + нік + час)")
+@app_commands.describe(k="Скільки гравців у топі (за замовчуванням 100)", page="З якої сторінки почати")
 @is_allowed_user()
-async def top_admin_command(interaction: discord.Interaction):
+async def top_admin_command(interaction: discord.Interaction, k: Optional[TopSize] = None, page: Optional[PageNumber] = None):
     await interaction.response.send_message("🦍 Завантажую секретні дані з кешу, це тільки для крутих...", ephemeral=True)
     
     try:
-        players_list = data_cache.get_current_month_data(with_steam_id=True)
-        
-        if not players_list:
-            status = data_cache.get_cache_status()
-            await interaction.edit_original_response(content=f"🦍 Оу, немає даних в кеші, мабуть щось зламалось.\n{status}")
-            return
-        
-        embeds = create_leaderboard_embeds(players_list, is_admin=True, title_suffix="")
-        
-        # Надсилаємо один embed
-        await interaction.edit_original_response(content=None, embed=embeds[0])
+        await send_leaderboard(interaction, 'admin', k, page, "🦍 Оу, немає даних в кеші, мабуть щось зламалось.")
             
     except Exception as e:
-        print(f"Error in topad command: {e}")
+        log.exception("Error in topad command: %s", e)
         await interaction.edit_original_response(content="🦍 Йой, щось пішло не так з данними. Попробуй ще раз пізніше!")
 
-@bot.tree.command(name="toppr", description="Топ 100 онлайн за попередній місяць (Steam ID + нік + час)")
+@bot.tree.command(name="toppr", description="Топ онлайн за попередній місяць (Steam ID + нік + час)")
+@app_commands.describe(k="Скільки гравців у топі (за замовчуванням 100)", page="З якої сторінки почати")
 @is_allowed_user()
-async def top_previous_month_command(interaction: discord.Interaction):
+async def top_previous_month_command(interaction: discord.Interaction, k: Optional[TopSize] = None,
+                                     page: Optional[PageNumber] = None):
     await interaction.response.send_message("🦍 Шукаю дані старого місяця в кеші, це займе трошки часу...", ephemeral=True)
     
     try:
-        players_list = data_cache.get_previous_month_data()
-        
-        if not players_list:
-            status = data_cache.get_cache_status()
-            await interaction.edit_original_response(content=f"🦍 Хм, немає даних минулого місяця в кеші, щось не грає.\n{status}")
-            return
-        
-        embeds = create_leaderboard_embeds(players_list, is_admin=True, title_suffix=" (попередній місяць)")
-        
-        # Надсилаємо один embed
-        await interaction.edit_original_response(content=None, embed=embeds[0])
+        await send_leaderboard(interaction, 'previous', k, page,
+                               "🦍 Хм, немає даних минулого місяця в кеші, щось не грає.")
             
     except Exception as e:
-        print(f"Error in toppr command: {e}")
+        log.exception("Error in toppr command: %s", e)
         await interaction.edit_original_response(content="🦍 Аяяй, щось не так з данними минулого місяця. Спробуй пізніше!")
 
 @bot.tree.command(name="randomsquadname", description="Генерує випадкову назву для Squad загону")
@@ -184,50 +209,69 @@ async def random_squad_name_command(interaction: discord.Interaction):
     )
 
 @bot.tree.command(name="autotop", description="Налаштувати автоматичне оновлення топу в цьому каналі")
+@app_commands.describe(view="Який топ показувати")
+@app_commands.choices(view=[
+    app_commands.Choice(name="Поточний місяць", value="auto"),
+    app_commands.Choice(name="Попередній місяць", value="previous_public")
+])
 @is_allowed_user()
-async def auto_top_command(interaction: discord.Interaction):
+async def auto_top_command(interaction: discord.Interaction, view: str = "auto"):
     await interaction.response.send_message("🦍 Налаштовую автоматичне оновлення топу, це буде круто...", ephemeral=True)
     
     try:
-        # Встановлюємо канал для автооновлень
-        Settings.AUTO_UPDATE_CHANNEL_ID = interaction.channel.id
-        
         # Відправляємо початкове повідомлення
-        players_list = data_cache.get_current_month_data(with_steam_id=False)
-        if players_list:
-            embeds = create_leaderboard_embeds(players_list, is_admin=False, title_suffix=" 🦍")
-            message = await interaction.channel.send(embed=embeds[0])
-            bot.auto_update_message_id = message.id
+        embed = embed_cache.get(view)
+        if embed:
+            message = await interaction.channel.send(embed=embed)
+            
+            # Підписка зберігається на диску, тому переживає перезапуск бота
+            subscription_registry.add(Subscription(
+                interaction.guild_id, interaction.channel.id, message.id, view, embed_cache.content_hash(view)
+            ))
             
             await interaction.edit_original_response(
                 content=f"🦍 Супер! Автоматичне оновлення топу налаштовано в каналі {interaction.channel.mention}\n"
-                        f"🦍 Повідомлення буде оновлюватись кожні 10 хвилин, як годинник!"
+                        f"🦍 Повідомлення оновлюватиметься одразу після кожного оновлення даних, як годинник!"
             )
         else:
             await interaction.edit_original_response(content="🦍 Оу, немає даних для показу, щось пішло не так")
             
     except Exception as e:
-        print(f"Error in autotop command: {e}")
+        log.exception("Error in autotop command: %s", e)
         await interaction.edit_original_response(content="🦍 Ой-ой, щось зламалось при налаштуванні автооновлення")
 
+@bot.tree.command(name="autotopstop", description="Вимкнути автоматичне оновлення топу в цьому каналі")
+@is_allowed_user()
+async def auto_top_stop_command(interaction: discord.Interaction):
+    removed = subscription_registry.remove_channel(interaction.channel.id)
+    if removed:
+        await interaction.response.send_message(f"🦍 Вимкнув автооновлення в цьому каналі ({removed} повідомл.)", ephemeral=True)
+    else:
+        await interaction.response.send_message("🦍 В цьому каналі автооновлення і так не було", ephemeral=True)
+
 @bot.tree.command(name="cachestatus", description="Показати статус кешу даних")
 @is_allowed_user()
 async def cache_status_command(interaction: discord.Interaction):
     status = data_cache.get_cache_status()
     next_update = "Хз коли"
     
-    if data_cache.last_update:
-        import time
-        time_since_update = datetime.now(timezone.utc) - data_cache.last_update
-        time_until_next = 600 - time_since_update.total_seconds()  # 600 сек = 10 хв
+    next_run_at = data_updater.next_iteration if data_updater.is_running() else None
+    if next_run_at:
+        time_until_next = (next_run_at - datetime.now(timezone.utc)).total_seconds()
         if time_until_next > 0:
             next_update = f"{int(time_until_next / 60)} хв {int(time_until_next % 60)} сек"
         else:
             next_update = "Прямо зараз!"
+    if data_cache.read_only:
+        feed = "сокет підключено" if snapshot_follower.connected else "перевіряю файл знімка"
+        next_update = f"робить фетчер ({feed})"
     
     embed = discord.Embed(
         title="🦍 Статус кешу даних",
-        description=f"{status}\n\n🦍 Наступне оновлення: {next_update}",
+        description=(f"{status}\n\n🦍 Наступне оновлення: {next_update} (інтервал {int(refresh_scheduler.interval)} сек)\n"
+                     f"⏱️ Затримка event loop: {loop_lag_monitor.last_lag * 1000:.0f} мс, "
+                     f"найгірша за останні {loop_lag_monitor.window} перевірок {loop_lag_monitor.max_lag * 1000:.0f} мс "
+                     f"(пул: {worker_pool.mode})"),
         color=discord.Color.blue(),
         timestamp=datetime.now(timezone.utc)
     )
@@ -240,110 +284,280 @@ async def update_cache_command(interaction: discord.Interaction):
     await interaction.response.send_message("🦍 Починаю оновлювати кеш даних, зачекай хвилинку...", ephemeral=True)
     
     try:
-        await data_cache.update_data()
+        if data_cache.read_only:
+            # Оновлює фетчер - просимо його і чекаємо на нове покоління
+            updated = await snapshot_follower.request_refresh()
+        else:
+            # Якщо оновлення вже йде - просто чекаємо на його результат
+            updated = await data_cache.update_data()
         status = data_cache.get_cache_status()
-        await interaction.edit_original_response(content=f"🦍 Кеш оновлено успішно!\n\n{status}")
+        if updated:
+            await interaction.edit_original_response(content=f"🦍 Кеш оновлено успішно!\n\n{status}")
+        else:
+            await interaction.edit_original_response(content=f"🦍 Не вдалось оновити кеш, показую старі дані.\n\n{status}")
     except Exception as e:
-        print(f"Error in updatecache command: {e}")
+        log.exception("Error in updatecache command: %s", e)
         await interaction.edit_original_response(content="🦍 Йой, щось пішло не так при оновленні кешу!")
 
-def create_leaderboard_embeds(players_list, is_admin: bool = False, title_suffix: str = ""):
-    """Створює один embed для лідерборду з усіма гравцями"""
-    if not players_list:
-        return []
-    
-    # Спробуємо показати всіх 100 гравців
-    display_players = players_list[:100]
-    
-    leaderboard_message = ""
-    
-    for i, player in enumerate(display_players):
-        if is_admin:
-            line = f"{i + 1}. **{player.steam_id}** **{player.name}**: {Tools.format_time(player.value)}"
-        else:
-            line = f"{i + 1}. **{player.name}**: {Tools.format_time(player.value)}"
+@bot.tree.command(name="history", description="Історія гравця по місяцях (час + місце)")
+@app_commands.describe(player="Нік або Battlemetrics ID гравця")
+@is_allowed_user()
+async def history_command(interaction: discord.Interaction, player: str):
+    try:
+        found = history_store.find_player(player.strip())
+        if not found:
+            await interaction.response.send_message(f"🦍 Не знайшов гравця **{player}** в історії", ephemeral=True)
+            return
         
-        # Перевіряємо чи не перевищуємо ліміт символів Discord (4096)
-        test_message = leaderboard_message + line + "\n"
-        if len(test_message) > 4000:  # Залишаємо трохи місця
-            remaining_count = len(players_list) - i
-            leaderboard_message += f"... та ще {remaining_count} гравців"
-            break
+        player_id, name = found
+        months = history_store.player_history(player_id)
+        lines = [
+            f"**{month}**: {Tools.format_time(seconds)}" + (f" (#{rank})" if rank else "")
+            for month, seconds, rank in months
+        ]
         
-        leaderboard_message += line + "\n"
-    
-    embed = discord.Embed(
-        title=f"Top 100 Online — SQUAD UKRAINE{title_suffix}",
-        description=leaderboard_message,
-        color=discord.Color.blue(),
-        timestamp=datetime.now(timezone.utc)
-    )
-    
-    # Додаємо інформацію про кількість показаних гравців
-    actual_shown = min(len(display_players), i + 1) if 'i' in locals() else len(display_players)
-    embed.add_field(
-        name="🦍 Статистика", 
-        value=f"Показано: {actual_shown} з {len(players_list)} гравців", 
-        inline=False
-    )
-    
-    if data_cache.last_update:
-        embed.set_footer(text=f"🦍 Оновлено: {data_cache.last_update.strftime('%H:%M:%S UTC')}")
-    
-    return [embed]
+        embed = discord.Embed(
+            title=f"🦍 Історія гравця {name}",
+            description="\n".join(lines) or "Немає записів",
+            color=discord.Color.blue(),
+            timestamp=datetime.now(timezone.utc)
+        )
+        embed.set_footer(text=f"Battlemetrics ID: {player_id}")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        
+    except Exception as e:
+        log.exception("Error in history command: %s", e)
+        await interaction.response.send_message("🦍 Ой, щось зламалось при читанні історії!", ephemeral=True)
 
-@tasks.loop(seconds=Settings.DATA_UPDATE_INTERVAL)
-async def data_updater():
-    """Фонова задача для оновлення даних кожні 10 хвилин"""
+@bot.tree.command(name="monthago", description="Топ за місяць N місяців тому (з історії, без запитів до Battlemetrics)")
+@app_commands.describe(months="Скільки місяців тому (1 - попередній місяць)")
+@is_allowed_user()
+async def month_ago_command(interaction: discord.Interaction, months: app_commands.Range[int, 0, 120]):
     try:
-        print("🦍 Starting scheduled data update...")
-        await data_cache.update_data()
+        month_key = Tools.get_month_key(months)
+        rows = history_store.month_top(month_key, limit=100)
+        if not rows:
+            # Для старих місяців історії могло ще не бути - пробуємо архів заморожених знімків
+            archived = month_archive.load(month_key)
+            rows = [(p.id, p.name, p.value) for p in archived.admin_view()] if archived else []
+        
+        if not rows:
+            await interaction.response.send_message(f"🦍 Немає даних за {month_key}", ephemeral=True)
+            return
+        
+        players_list = [Player(name, player_id, seconds) for player_id, name, seconds in rows]
+        embeds = create_leaderboard_embeds(players_list, is_admin=False, title_suffix=f" ({month_key})")
+        await interaction.response.send_message(embed=embeds[0], ephemeral=True)
+        
     except Exception as e:
-        print(f"Error in data updater: {e}")
+        log.exception("Error in monthago command: %s", e)
+        await interaction.response.send_message("🦍 Ой, щось зламалось при читанні історії!", ephemeral=True)
 
-@tasks.loop(minutes=10)
-async def auto_update_top():
-    """Фонова задача для автоматичного оновлення топу"""
+@bot.tree.command(name="trajectory", description="Як змінювалось місце гравця в топі цього місяця")
+@app_commands.describe(player="Нік або Battlemetrics ID гравця")
+@is_allowed_user()
+async def trajectory_command(interaction: discord.Interaction, player: str):
     try:
-        if not Settings.AUTO_UPDATE_CHANNEL_ID or not bot.auto_update_message_id:
+        found = history_store.find_player(player.strip())
+        if not found:
+            await interaction.response.send_message(f"🦍 Не знайшов гравця **{player}** в історії", ephemeral=True)
             return
         
-        channel = bot.get_channel(Settings.AUTO_UPDATE_CHANNEL_ID)
-        if not channel:
+        player_id, name = found
+        month_key = Tools.get_month_key()
+        points = history_store.rank_trajectory(player_id, month_key)
+        
+        # Показуємо останнє місце за кожен день
+        by_day = {}
+        for taken_at, rank, seconds in points:
+            day = datetime.fromtimestamp(taken_at, timezone.utc).strftime("%d.%m")
+            by_day[day] = (rank, seconds)
+        lines = [f"**{day}**: #{rank} — {Tools.format_time(seconds)}" for day, (rank, seconds) in by_day.items()]
+        
+        embed = discord.Embed(
+            title=f"🦍 Траєкторія {name} за {month_key}",
+            description="\n".join(lines) or "Немає записів за цей місяць",
+            color=discord.Color.blue(),
+            timestamp=datetime.now(timezone.utc)
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        
+    except Exception as e:
+        log.exception("Error in trajectory command: %s", e)
+        await interaction.response.send_message("🦍 Ой, щось зламалось при читанні історії!", ephemeral=True)
+
+@bot.tree.command(name="player", description="Картка гравця: місце, час і різниця з попереднім місяцем")
+@app_commands.describe(player="Нік, Battlemetrics ID або Steam ID гравця")
+@is_allowed_user()
+async def player_command(interaction: discord.Interaction, player: str):
+    try:
+        # З автодоповнення приходить Battlemetrics ID, з ручного вводу - будь-що
+        entry = player_index.find(player)
+        if entry is None:
+            await interaction.response.send_message(f"🦍 Не знайшов гравця **{player}** в топі цього чи минулого місяця", ephemeral=True)
             return
         
-        message = await channel.fetch_message(bot.auto_update_message_id)
-        if not message:
+        embed = create_player_embed(entry, is_admin=True, updated_at=data_cache.snapshot().built_at)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        
+    except Exception as e:
+        log.exception("Error in player command: %s", e)
+        await interaction.response.send_message("🦍 Ой, щось зламалось при пошуку гравця!", ephemeral=True)
+
+@player_command.autocomplete('player')
+async def player_autocomplete(interaction: discord.Interaction, current: str):
+    # Тільки пам'ять і жодного await - відповідь має вкластися у 3 секунди Discord
+    choices = []
+    for entry in player_index.search(current):
+        rank = f"#{entry.current_rank}" if entry.current_rank else "мин. міс."
+        choices.append(app_commands.Choice(name=f"{entry.name} ({rank})"[:100], value=str(entry.player_id)))
+    return choices
+
+SERVER_CHOICES = [
+    app_commands.Choice(name=Settings.SERVER_NAMES.get(server_id, str(server_id)), value=server_id)
+    for server_id in Settings.SERVER_IDS
+]
+
+def sync_shared_state():
+    """У режимі consumer суми по серверах і денну активність пише фетчер - перечитуємо змінені файли"""
+    if data_cache.read_only:
+        running_totals.reload_if_changed()
+        activity_aggregates.reload_changed()
+
+def format_server_split(servers) -> str:
+    return ", ".join(f"{Settings.SERVER_NAMES.get(server_id, server_id)} {Tools.format_time(seconds)}"
+                     for server_id, seconds in sorted(servers.items(), key=lambda item: -item[1]))
+
+@bot.tree.command(name="servertop", description="Топ цього місяця тільки по одному серверу")
+@app_commands.describe(server="Сервер")
+@app_commands.choices(server=SERVER_CHOICES)
+@is_allowed_user()
+async def server_top_command(interaction: discord.Interaction, server: app_commands.Choice[int]):
+    try:
+        # Суми по серверах вже є в накопичених сумах місяця - нічого не запитуємо
+        sync_shared_state()
+        if running_totals.month_key != Tools.get_month_key():
+            await interaction.response.send_message("🦍 Розбивки по серверах за цей місяць ще немає", ephemeral=True)
             return
         
-        players_list = data_cache.get_current_month_data(with_steam_id=False)
-        if players_list:
-            embeds = create_leaderboard_embeds(players_list, is_admin=False, title_suffix=" 🦍")
-            await message.edit(embed=embeds[0])
-            print(f"🦍 Auto-updated top message in channel {channel.name}")
+        rows = running_totals.server_leaders(server.value, Settings.LEADERBOARD_TOP_N)
+        players_list = [Player(name, player_id, seconds) for player_id, name, seconds in rows]
+        embeds = create_leaderboard_embeds(players_list, is_admin=False, title_suffix=f" ({server.name})",
+                                           updated_at=data_cache.last_update)
+        if not embeds:
+            await interaction.response.send_message(f"🦍 На {server.name} цього місяця ще ніхто не грав", ephemeral=True)
+            return
+        await interaction.response.send_message(embed=embeds[0], ephemeral=True)
         
     except Exception as e:
-        print(f"Error in auto update: {e}")
+        log.exception("Error in servertop command: %s", e)
+        await interaction.response.send_message("🦍 Ой, щось зламалось при побудові топу сервера!", ephemeral=True)
 
-@data_updater.before_loop
-async def before_data_updater():
-    print("🦍 Waiting for bot to be ready before starting data updater...")
+@bot.tree.command(name="weektop", description="Найактивніші гравці за останні дні")
+@app_commands.describe(days="За скільки останніх днів (7 - тиждень)", server="Тільки один сервер")
+@app_commands.choices(server=SERVER_CHOICES)
+@is_allowed_user()
+async def week_top_command(interaction: discord.Interaction, days: app_commands.Range[int, 1, Settings.ACTIVITY_RETENTION_DAYS] = 7,
+                           server: Optional[app_commands.Choice[int]] = None):
+    try:
+        sync_shared_state()
+        rows = activity_aggregates.most_active(days, Settings.LEADERBOARD_TOP_N, server.value if server else None)
+        players_list = [Player(name, player_id, seconds) for player_id, name, seconds in rows]
+        suffix = f" (за {days} дн." + (f", {server.name})" if server else ")")
+        embeds = create_leaderboard_embeds(players_list, is_admin=False, title_suffix=suffix,
+                                           updated_at=data_cache.last_update)
+        if not embeds:
+            await interaction.response.send_message("🦍 За цей час даних про активність ще немає", ephemeral=True)
+            return
+        await interaction.response.send_message(embed=embeds[0], ephemeral=True)
+        
+    except Exception as e:
+        log.exception("Error in weektop command: %s", e)
+        await interaction.response.send_message("🦍 Ой, щось зламалось при побудові топу активності!", ephemeral=True)
+
+@bot.tree.command(name="activity", description="Активність по днях: гравця або всіх серверів разом")
+@app_commands.describe(player="Нік, Battlemetrics ID або Steam ID (порожньо - всі гравці)", days="Скільки останніх днів")
+@is_allowed_user()
+async def activity_command(interaction: discord.Interaction, player: Optional[str] = None,
+                           days: app_commands.Range[int, 1, Settings.ACTIVITY_RETENTION_DAYS] = 14):
+    try:
+        sync_shared_state()
+        if player:
+            entry = player_index.find(player)
+            player_id = entry.player_id if entry else (int(player) if player.strip().isdigit() else None)
+            if player_id is None:
+                await interaction.response.send_message(f"🦍 Не знайшов гравця **{player}**", ephemeral=True)
+                return
+            name = entry.name if entry else activity_aggregates.names.get(player_id, str(player_id))
+            title = f"🦍 Активність {name} за {days} дн."
+            lines = [
+                f"**{datetime.fromisoformat(day).strftime('%d.%m')}**: {Tools.format_time(sum(servers.values()))} ({format_server_split(servers)})"
+                for day, servers in activity_aggregates.player_days(player_id, days)
+            ]
+        else:
+            title = f"🦍 Активність серверів за {days} дн."
+            lines = [
+                f"**{datetime.fromisoformat(day).strftime('%d.%m')}**: {Tools.format_time(seconds)} — {count} гравців"
+                for day, seconds, count in activity_aggregates.daily_totals(days)
+            ]
+        
+        embed = discord.Embed(
+            title=title,
+            description="\n".join(lines) or "Немає записів",
+            color=discord.Color.blue(),
+            timestamp=datetime.now(timezone.utc)
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        
+    except Exception as e:
+        log.exception("Error in activity command: %s", e)
+        await interaction.response.send_message("🦍 Ой, щось зламалось при читанні активності!", ephemeral=True)
+
+activity_command.autocomplete('player')(player_autocomplete)
+
+@tasks.loop(seconds=Settings.DATA_UPDATE_INTERVAL)
+async def data_updater():
+    """Фонова задача для оновлення даних; інтервал підбирає refresh_scheduler після кожного запуску"""
+    try:
+        log.debug("🦍 Starting scheduled data update...")
+        await data_cache.update_data()
+    except Exception as e:
+        log.exception("Error in data updater: %s", e)
+    
+    try:
+        interval = await refresh_scheduler.schedule(data_cache.snapshot())
+        # Всередині тіла циклу change_interval переносить вже заплановану наступну ітерацію
+        data_updater.change_interval(seconds=interval)
+    except Exception as e:
+        log.exception("Error in refresh scheduling: %s", e)
+
+@data_cache.subscribe
+async def on_new_generation(generation):
+    """Реагує на нове покоління даних: збирає embed і одразу оновлює підписані повідомлення"""
+    embed_cache.prewarm()
+    player_index.update(generation)
+    if not Settings.AUTO_TOP_OWNER:
+        # Підписки обслуговує інший бот-процес, інакше кожне повідомлення редагувалось би кілька разів
+        return
     await bot.wait_until_ready()
+    await auto_top_scheduler.run_once(bot)
 
-@auto_update_top.before_loop
-async def before_auto_update():
-    print("🦍 Waiting for bot to be ready before starting auto update...")
+@data_updater.before_loop
+async def before_data_updater():
+    log.info("🦍 Waiting for bot to be ready before starting data updater...")
     await bot.wait_until_ready()
 
 @bot.tree.error
 async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    command_name = interaction.command.qualified_name if interaction.command else 'unknown'
+    command_errors.inc(command=command_name)
     if isinstance(error, app_commands.CheckFailure):
         await interaction.response.send_message(
             "🦍 Ей, у тебе немає прав для цієї команди, хлопець!", 
             ephemeral=True
         )
     else:
-        print(f"Command error: {error}")
+        log.error("Command /%s error: %s", command_name, error, exc_info=error)
         if not interaction.response.is_done():
             await interaction.response.send_message(
                 "🦍 Ой-ой, щось пішло не так при виконанні команди!", 
@@ -353,21 +567,28 @@ async def on_app_command_error(interaction: discord.Interaction, error: app_comm
 async def main():
     token = os.getenv('TOKEN_BOT')
     if not token:
-        print("ERROR: TOKEN_BOT не знайдено в змінних середовища")
+        log.error("TOKEN_BOT не знайдено в змінних середовища")
         return
     
-    print("Starting bot...")
-    print(f"Bot token present: {bool(token)}")
-    print(f"BM token present: {bool(os.getenv('TOKEN_BM'))}")
+    log.info("Starting bot...")
+    log.info("BM token present: %s", bool(os.getenv('TOKEN_BM')))
+    
+    # Завантажуємо кеш Steam ID, історію і знімок кешу до підключення до Discord
+    if Settings.BOT_MODE == 'consumer':
+        data_cache.read_only = True
+    else:
+        steam_id_cache.load()
+    history_store.load()
+    subscription_registry.load()
+    data_cache.load_snapshot()
     
     try:
-        print("Creating bot instance...")
         # Спочатку запускаємо бота без фонових задач
         await bot.start(token)
     except Exception as e:
-        print(f"Failed to start bot: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Failed to start bot: %s", e)
+    finally:
+        await bm_client.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,301 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+from settings import Settings
+
+log = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+
+# Межі бакетів гістограм за замовчуванням (в секундах)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+INF_LABEL = 'le="+Inf"'
+
+_ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
+def endpoint_label(url: str) -> str:
+    """Перетворює URL запиту на шаблон ендпоінта без ID, щоб кількість міток була обмеженою"""
+    return _ID_SEGMENT.sub('/{id}', urlsplit(url).path) or '/'
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+class Counter(_Metric):
+    """Лічильник, що тільки зростає"""
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+            for key, value in sorted(self._values.items())
+        ]
+
+class Gauge(_Metric):
+    """Значення, яке може рости і падати"""
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str):
+        self._values[self._key(labels)] = value
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+            for key, value in sorted(self._values.items())
+        ]
+
+class Histogram(_Metric):
+    """Розподіл значень по фіксованих бакетах (кумулятивно, як у Prometheus)"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [лічильники бакетів..., сума, кількість]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[index] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Міряє тривалість блоку with"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def summary(self, **labels: str) -> Tuple[int, float]:
+        """Повертає (кількість, сума) спостережень"""
+        state = self._values.get(self._key(labels))
+        if state is None:
+            return 0, 0.0
+        return int(state[-1]), state[-2]
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, state in sorted(self._values.items()):
+            labels = _format_labels(self.labelnames, key)
+            for bound, count in zip(self.buckets, state):
+                le = 'le="%s"' % _format_value(float(bound))
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}')
+            lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, INF_LABEL)} {state[-1]}')
+            lines.append(f'{self.name}_sum{labels} {_format_value(state[-2])}')
+            lines.append(f'{self.name}_count{labels} {state[-1]}')
+        return lines
+
+class MetricsRegistry:
+    """Набір метрик бота у текстовому форматі Prometheus"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        # Функції, що оновлюють gauge-и перед кожним експортом (лічильники кешів тощо)
+        self._collectors: List[Callable[[], None]] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception:
+                log.exception("Metrics collector %s failed", getattr(collector, '__name__', collector))
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+# Глобальний реєстр метрик і метрики гарячих шляхів
+metrics = MetricsRegistry()
+
+bm_requests = metrics.counter('squadbot_bm_requests_total', 'Requests to the BattleMetrics API', ('endpoint', 'status'))
+bm_request_seconds = metrics.histogram('squadbot_bm_request_seconds', 'BattleMetrics request latency without rate limiter wait', ('endpoint',))
+bm_rate_limited = metrics.counter('squadbot_bm_rate_limited_total', 'HTTP 429 responses from BattleMetrics', ('endpoint',))
+refresh_phase_seconds = metrics.histogram('squadbot_refresh_phase_seconds', 'Duration of data refresh phases', ('phase',),
+                                          buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0))
+refreshes = metrics.counter('squadbot_refreshes_total', 'Data refreshes by result', ('result',))
+cache_lookups = metrics.gauge('squadbot_cache_lookups', 'Cache hits and misses since start', ('cache', 'result'))
+cache_hit_ratio = metrics.gauge('squadbot_cache_hit_ratio', 'Share of cache lookups served from the cache', ('cache',))
+command_seconds = metrics.histogram('squadbot_command_seconds', 'Slash command latency from interaction to completion', ('command',))
+command_errors = metrics.counter('squadbot_command_errors_total', 'Slash commands that ended with an error', ('command',))
+loop_lag_seconds = metrics.histogram('squadbot_event_loop_lag_seconds', 'How late the event loop woke up a periodic timer',
+                                     buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+loop_lag_max = metrics.gauge('squadbot_event_loop_lag_max_seconds', 'Worst event loop lag in the last monitoring window')
+worker_task_seconds = metrics.histogram('squadbot_worker_task_seconds', 'Refresh stages run in the worker pool (or inline)', ('stage', 'mode'))
+
+def set_cache_lookups(cache: str, hits: int, misses: int):
+    """Оновлює gauge-и кешу - викликається з колекторів модулів, що мають власні лічильники"""
+    cache_lookups.set(hits, cache=cache, result='hit')
+    cache_lookups.set(misses, cache=cache, result='miss')
+    total = hits + misses
+    cache_hit_ratio.set(hits / total if total else 0.0, cache=cache)
+
+class LoopLagMonitor:
+    """Періодично засинає на фіксований час і міряє, наскільки пізніше event loop його розбудив"""
+
+    def __init__(self, interval: float = Settings.LOOP_LAG_INTERVAL, window: int = 60):
+        self.interval = interval
+        self.window = window
+        self.last_lag = 0.0
+        self._recent: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    @property
+    def max_lag(self) -> float:
+        return max(self._recent, default=0.0)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.last_lag = lag
+            self._recent.append(lag)
+            if len(self._recent) > self.window:
+                del self._recent[0]
+            loop_lag_seconds.observe(lag)
+            loop_lag_max.set(self.max_lag)
+            if lag >= Settings.LOOP_LAG_WARN:
+                log.warning("Event loop lagged %.3fs behind schedule", lag)
+
+class MetricsExporter:
+    """Віддає метрики по HTTP (/metrics) і/або періодично пише їх у файл для node_exporter"""
+
+    def __init__(self, registry: MetricsRegistry, port: int = Settings.METRICS_PORT,
+                 file_path: str = Settings.METRICS_FILE):
+        self.registry = registry
+        self.port = port
+        self.file_path = file_path
+        self._runner = None
+        self._file_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self.port:
+            from aiohttp import web
+
+            async def handle(request):
+                return web.Response(text=self.registry.render(), content_type='text/plain', charset='utf-8',
+                                    headers={'X-Prometheus-Format': '0.0.4'})
+
+            app = web.Application()
+            app.router.add_get('/metrics', handle)
+            self._runner = web.AppRunner(app, access_log=None)
+            await self._runner.setup()
+            await web.TCPSite(self._runner, Settings.METRICS_HOST, self.port).start()
+            log.info("Metrics endpoint on http://%s:%s/metrics", Settings.METRICS_HOST, self.port)
+
+        if self.file_path and (self._file_task is None or self._file_task.done()):
+            self._file_task = asyncio.create_task(self._write_periodically())
+            log.info("Writing metrics to %s every %ss", self.file_path, Settings.METRICS_FILE_INTERVAL)
+
+    async def _write_periodically(self):
+        while True:
+            try:
+                self.write_file()
+            except OSError as e:
+                log.warning("Could not write metrics file %s: %s", self.file_path, e)
+            await asyncio.sleep(Settings.METRICS_FILE_INTERVAL)
+
+    def write_file(self):
+        """Атомарно, щоб скрейпер ніколи не прочитав файл наполовину"""
+        directory = os.path.dirname(self.file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.file_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.registry.render())
+        os.replace(tmp_path, self.file_path)
+
+    async def stop(self):
+        if self._file_task is not None:
+            self._file_task.cancel()
+            self._file_task = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+loop_lag_monitor = LoopLagMonitor()
+metrics_exporter = MetricsExporter(metrics)
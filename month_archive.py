@@ -0,0 +1,75 @@
+import json
+import logging
+import os
+from typing import Dict, Iterable, Optional
+from settings import Settings
+from tools import Tools
+from leaderboard import Leaderboard
+
+log = logging.getLogger(__name__)
+
+class MonthArchive:
+    """Знімки лідерборду закритих місяців на диску (один JSON файл на місяць)"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        # Вже прочитані знімки - закритий місяць більше не змінюється, тому кешуємо назавжди
+        self._loaded: Dict[str, Leaderboard] = {}
+
+    def _path(self, month_key: str) -> str:
+        return os.path.join(self.directory, f"{month_key}.json")
+
+    def has(self, month_key: str) -> bool:
+        return month_key in self._loaded or os.path.exists(self._path(month_key))
+
+    def load(self, month_key: str, required_servers: Optional[Iterable[int]] = None) -> Optional[Leaderboard]:
+        """Повертає знімок місяця або None якщо його ще не заморожено
+
+        required_servers - сервери, які мають бути в знімку; якщо якогось немає (список серверів
+        змінився), знімок вважається незамороженим і місяць завантажується заново.
+        """
+        if month_key in self._loaded:
+            return self._loaded[month_key]
+
+        path = self._path(month_key)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            board = Leaderboard.from_dict(data['leaderboard'])
+            # Старі знімки без розбивки по серверах приймаємо як є
+            servers = data.get('servers')
+            frozen_servers = {int(server_id) for server_id in servers} if servers is not None else None
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            log.warning("🦍 Could not read month snapshot %s: %s", path, e)
+            return None
+        
+        if frozen_servers is not None and required_servers is not None:
+            missing = set(required_servers) - frozen_servers
+            if missing:
+                log.warning("🦍 Frozen snapshot for %s has no data for servers %s, ignoring it", month_key, sorted(missing))
+                return None
+
+        self._loaded[month_key] = board
+        log.info("🦍 Loaded frozen snapshot for %s: %d players", month_key, len(board))
+        return board
+
+    def save(self, month_key: str, board: Leaderboard, servers: Optional[Dict[int, str]] = None):
+        """Заморожує місяць - записує знімок, який більше не буде перезавантажуватись
+
+        servers - стан кожного сервера при завантаженні (всі мають бути повні).
+        """
+        data = {
+            'month': month_key,
+            'leaderboard': board.to_dict()
+        }
+        if servers is not None:
+            data['servers'] = servers
+        Tools.atomic_write_json(self._path(month_key), data)
+        self._loaded[month_key] = board
+        log.info("🦍 Frozen snapshot for %s: %d players", month_key, len(board))
+
+# Глобальний архів закритих місяців
+month_archive = MonthArchive(Settings.MONTH_ARCHIVE_DIR)
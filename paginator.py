@@ -0,0 +1,140 @@
+import logging
+import time
+from typing import Dict, List, Optional
+from bm_client import BattleMetricsClient
+from aggregator import Row, top_k
+from json_backend import decode_leaderboard_page
+
+log = logging.getLogger(__name__)
+
+# Стани сервера, з якими об'єднаний топ повний і його можна заморожувати
+COMPLETE_STATUSES = ('complete', 'settled')
+
+class LeaderboardPaginator:
+    """Потоково читає сторінки лідерборду одного сервера, йдучи по links.next"""
+
+    def __init__(self, client: BattleMetricsClient, server_id: int, params: Dict[str, str],
+                 alt_params: Optional[Dict[str, str]] = None, max_pages: int = 50):
+        self.client = client
+        self.server_id = server_id
+        self.url = f"/servers/{server_id}/relationships/leaderboards/time"
+        self.next_url: Optional[str] = self.url
+        self.params: Optional[Dict[str, str]] = params
+        self.alt_params = alt_params
+        self.max_pages = max_pages
+        self.pages = 0
+        self.rows = 0
+        # Значення останнього прочитаного рядка - більше жоден невидимий гравець цього сервера не має
+        self.floor: Optional[int] = None
+        self.exhausted = False
+        # Зупинились на max_pages, хоча сторінки ще були - рядки далі не враховані
+        self.truncated = False
+        # Battlemetrics відповів 400 на основний формат періоду (навіть якщо альтернативний потім спрацював)
+        self.period_rejected = False
+        # Статистика сервера: скільки часу пішло на запити і чим закінчилась помилка
+        self.elapsed = 0.0
+        self.error: Optional[str] = None
+
+    @property
+    def status(self) -> str:
+        """complete - прочитано все, settled - решта сторінок не змінить топ, truncated - обрізано max_pages, error"""
+        if self.error:
+            return 'error'
+        if self.truncated:
+            return 'truncated'
+        return 'complete' if self.exhausted else 'settled'
+
+    def remaining_bound(self) -> int:
+        """Верхня межа часу гравця якого ми ще не бачили на цьому сервері"""
+        if self.exhausted:
+            return 0
+        if self.floor is None:
+            return 2 ** 62
+        return self.floor
+
+    async def fetch_next(self) -> List[Row]:
+        """Отримує наступну сторінку; повертає порожній список коли сторінок більше немає"""
+        if self.exhausted or self.next_url is None:
+            self.exhausted = True
+            return []
+
+        started = time.monotonic()
+        try:
+            return await self._fetch_page()
+        except Exception as e:
+            # Помилка одного сервера не зупиняє решту - просто перестаємо його читати
+            log.error("Error fetching page %d from server %s: %s", self.pages + 1, self.server_id, e)
+            self.error = str(e)
+            self.exhausted = True
+            return []
+        finally:
+            self.elapsed += time.monotonic() - started
+
+    async def _fetch_page(self) -> List[Row]:
+        response = await self.client.get(self.next_url, params=self.params)
+        if response.status == 400 and self.pages == 0:
+            self.period_rejected = True
+            if self.alt_params:
+                log.warning("Failed to fetch data from %s. Status code: 400", self.url)
+                log.debug("Response: %s", response.text())
+                log.info("Trying alternative period format: %s", self.alt_params.get('filter[period]'))
+                self.params = self.alt_params
+                response = await self.client.get(self.next_url, params=self.params)
+
+        if response.status != 200:
+            log.error("Failed to fetch page %d from %s. Status code: %s", self.pages + 1, self.url, response.status)
+            log.debug("Response: %s", response.text())
+            self.error = f"HTTP {response.status}"
+            self.exhausted = True
+            return []
+
+        rows, next_url = decode_leaderboard_page(response.body)
+
+        self.pages += 1
+        self.rows += len(rows)
+        # Наступні сторінки вже містять всі параметри в самому посиланні
+        self.params = None
+        self.next_url = next_url
+
+        if rows:
+            self.floor = rows[-1][2]
+        if not rows or not self.next_url or self.pages >= self.max_pages:
+            self.exhausted = True
+            self.truncated = bool(rows and self.next_url)
+
+        return rows
+
+def top_n_is_settled(top_n: int, totals: Dict[int, int], seen: Dict[int, int],
+                     paginators: List[LeaderboardPaginator]) -> bool:
+    """Перевіряє чи непрочитані сторінки ще можуть змінити склад або суми об'єднаного топу
+
+    totals - сума часу гравця по вже прочитаних рядках,
+    seen - бітова маска серверів (індекси в paginators) де гравця вже бачили.
+    """
+    bounds = [p.remaining_bound() for p in paginators]
+    unseen_bound = sum(bounds)
+    if unseen_bound == 0:
+        return True
+    if len(totals) < top_n:
+        return False
+
+    leaders = top_k(totals, top_n)
+    kth_value = leaders[-1][1]
+
+    # Гравець якого ще ніде не бачили не зможе обігнати N-го
+    if unseen_bound > kth_value:
+        return False
+
+    leader_ids = {player_id for player_id, _ in leaders}
+    for player_id, total in totals.items():
+        mask = seen[player_id]
+        missing = sum(bound for index, bound in enumerate(bounds) if not mask & (1 << index))
+        if player_id in leader_ids:
+            # Лідер ще може мати непрочитаний рядок на сервері, де його не бачили -
+            # тоді його сума (і порядок у топі) ще не остаточні
+            if missing > 0:
+                return False
+        elif total + missing > kth_value:
+            return False
+
+    return True
@@ -1,241 +1,171 @@
-import aiohttp
 import asyncio
-import os
-from typing import List, Dict, Any
+import logging
+from typing import List, Dict, Optional
 from settings import Settings
 from tools import Tools
+from steam_id_resolver import SteamIdResolver, steam_id_resolver
+from bm_client import BattleMetricsClient, bm_client
+from paginator import LeaderboardPaginator, top_n_is_settled
+from aggregator import Row, TopKMerger
+from metrics import refresh_phase_seconds
+
+log = logging.getLogger(__name__)
 
 class Player:
+    __slots__ = ('name', 'id', 'value', 'steam_id')
+    
     def __init__(self, name: str, player_id: int, value: int):
         self.name = name
         self.id = player_id
         self.value = value
         self.steam_id = 0
     
-    async def fetch_steam_id(self):
-        """Отримує Steam ID гравця з API Battlemetrics"""
-        url = f"https://api.battlemetrics.com/players/{self.id}?include=identifier&filter[identifiers]=steamID"
-        
-        headers = {
-            'Accept': 'application/json',
-            'Authorization': f'Bearer {Settings.TOKEN_BM}'
-        }
-        
-        # Додаємо retry логіку для 429 помилок
-        max_retries = 3
-        for attempt in range(max_retries):
-            session = None
-            try:
-                session = aiohttp.ClientSession()
-                async with session.get(url, headers=headers) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        identifiers = data.get('included', [])
-                        
-                        print(f"Player {self.name} (ID: {self.id}) - found {len(identifiers)} identifiers")
-                        
-                        for identifier in identifiers:
-                            identifier_type = identifier.get('type')
-                            attributes = identifier.get('attributes', {})
-                            attr_type = attributes.get('type')
-                            identifier_value = attributes.get('identifier', '')
-                            
-                            print(f"  Identifier: type={identifier_type}, attr_type={attr_type}, value={identifier_value}")
-                            
-                            if (identifier_type == 'identifier' and attr_type == 'steamID'):
-                                try:
-                                    self.steam_id = int(identifier_value)
-                                    print(f"  ✓ Set Steam ID: {self.steam_id}")
-                                    return
-                                except ValueError:
-                                    print(f"  ✗ Could not parse '{identifier_value}' as int")
-                        
-                        if self.steam_id == 0:
-                            print(f"  ✗ No valid Steam ID found for {self.name}")
-                        return
-                        
-                    elif response.status == 429:
-                        retry_after = response.headers.get('Retry-After', '10')
-                        wait_time = int(retry_after)
-                        print(f"Rate limited for player {self.id}, waiting {wait_time} seconds (attempt {attempt + 1}/{max_retries})")
-                        if attempt < max_retries - 1:
-                            await asyncio.sleep(wait_time)
-                            continue
-                        else:
-                            print(f"Failed to fetch Steam ID for player {self.id}: HTTP 429 (max retries exceeded)")
-                            return
-                    else:
-                        print(f"Failed to fetch Steam ID for player {self.id}: HTTP {response.status}")
-                        return
-            except Exception as e:
-                print(f"Error fetching Steam ID for player {self.id}: {e}")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(2)
-                    continue
-                return
-            finally:
-                if session and not session.closed:
-                    await session.close()
+    async def fetch_steam_id(self, use_cache: bool = True, client: Optional[BattleMetricsClient] = None):
+        """Отримує Steam ID гравця з кешу або з API Battlemetrics"""
+        resolver = steam_id_resolver if client is None or client is bm_client else SteamIdResolver(client)
+        steam_id = await resolver.resolve_one(self.id, use_cache=use_cache)
+        if steam_id is not None:
+            self.steam_id = steam_id
 
 class Parser:
-    def __init__(self):
+    def __init__(self, client: Optional[BattleMetricsClient] = None):
         self.settings = Settings()
+        self.client = client or bm_client
+        # Спільний resolver - щоб паралельні запити одного гравця не дублювались
+        self.steam_ids = steam_id_resolver if self.client is bm_client else SteamIdResolver(self.client)
+        # Хоч один сервер відхилив період з часом (400) - вікна без альтернативного формату не спрацюють
+        self.period_rejected = False
     
-    async def fetch_and_parse_leaderboard(self, is_admin: bool = False, is_current_month: bool = True) -> List[Player]:
-        """Отримує і парсить дані лідерборду з серверів"""
-        print(f"Starting leaderboard fetch - admin: {is_admin}, current_month: {is_current_month}")
-        
-        url_sq1 = f"https://api.battlemetrics.com/servers/{Settings.SERVER_ID_SQ_1}/relationships/leaderboards/time"
-        url_sq2 = f"https://api.battlemetrics.com/servers/{Settings.SERVER_ID_SQ_2}/relationships/leaderboards/time"
+    async def fetch_and_parse_leaderboard(self, is_admin: bool = False, is_current_month: bool = True,
+                                          top_n: int = Settings.LEADERBOARD_TOP_N,
+                                          server_status: Optional[Dict[int, str]] = None) -> List[Player]:
+        """Отримує і парсить дані лідерборду з серверів
+
+        server_status - необов'язковий словник, куди записується стан кожного сервера (LeaderboardPaginator.status).
+        """
+        log.info("Starting leaderboard fetch - admin: %s, current_month: %s", is_admin, is_current_month)
         
-        page_size = 100
         period = Tools.get_period() if is_current_month else Tools.get_previous_month_period()
-        print(f"Period: {period}")
+        alt_period = Tools.get_alternative_period() if is_current_month else Tools.get_alternative_previous_month_period()
+        log.debug("Period: %s", period)
         
         if not Settings.TOKEN_BM:
-            print("ERROR: TOKEN_BM is empty!")
+            log.error("TOKEN_BM is empty!")
             return []
         
-        headers = {
-            'Accept': 'application/json',
-            'Authorization': f'Bearer {Settings.TOKEN_BM}'
-        }
-        
-        params = {
-            'page[size]': str(page_size),
-            'filter[period]': period
-        }
-        
-        players = []
-        session = None
-        
         try:
-            session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
-            await self._fetch_players_from_server(session, url_sq1, params, headers, players)
-            await self._fetch_players_from_server(session, url_sq2, params, headers, players)
+            paginators = self._make_paginators(period, alt_period)
+            players = await self._fetch_top_players(paginators, top_n)
             
-            print(f"Fetched {len(players)} players before deduplication")
+            if is_admin:
+                await self.resolve_steam_ids(players)
             
-            players = await self._remove_duplicate_players(players)
-            print(f"After deduplication: {len(players)} players")
-            
-            if is_admin and True:
-                print("Fetching Steam IDs...")
-                await self._fetch_steam_ids_for_players(players)
-                print("Steam IDs fetched")
-                
-                steam_ids_found = sum(1 for p in players if p.steam_id != 0)
-                print(f"Steam IDs found: {steam_ids_found}/{len(players)}")
-            elif is_admin:
-                print("Steam ID fetching disabled due to rate limiting")
-                for player in players:
-                    player.steam_id = player.id
-            
-            sorted_players = sorted(players, key=lambda x: x.value, reverse=True)
-            result = sorted_players[:100]
-            print(f"Returning {len(result)} players")
-            return result
+            # Стан записуємо тільки якщо дійшли до кінця - інакше порожній список не відрізнити від збою
+            if server_status is not None:
+                server_status.update((paginator.server_id, paginator.status) for paginator in paginators)
+            log.info("Returning %d players", len(players))
+            return players
         
         except Exception as e:
-            print(f"Error in fetch_and_parse_leaderboard: {e}")
+            log.exception("Error in fetch_and_parse_leaderboard: %s", e)
             return []
-        finally:
-            if session and not session.closed:
-                await session.close()
-    
-    async def _fetch_players_from_server(self, session: aiohttp.ClientSession, url: str, 
-                                       params: Dict[str, str], headers: Dict[str, str], 
-                                       players: List[Player]):
-        """Отримує дані гравців з одного сервера"""
-        try:
-            print(f"Making request to: {url}")
-            print(f"Params: {params}")
-            
-            async with session.get(url, params=params, headers=headers) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    users = data.get('data', [])
-                    
-                    print(f"Got {len(users)} users from {url}")
-                    
-                    for user_data in users:
-                        try:
-                            player_id = int(user_data.get('id', '0'))
-                            name = user_data.get('attributes', {}).get('name', '')
-                            value = int(user_data.get('attributes', {}).get('value', '0'))
-                            
-                            if player_id and name and value:
-                                player = Player(name, player_id, value)
-                                players.append(player)
-                        except (ValueError, TypeError) as e:
-                            print(f"Error parsing player data: {e}")
-                            continue
-                else:
-                    error_text = await response.text()
-                    print(f"Failed to fetch data from {url}. Status code: {response.status}")
-                    print(f"Response: {error_text}")
-                    
-                    if response.status == 400:
-                        print("Trying alternative period format...")
-                        alt_period = Tools.get_alternative_period() if params['filter[period]'] == Tools.get_period() else Tools.get_alternative_previous_month_period()
-                        alt_params = params.copy()
-                        alt_params['filter[period]'] = alt_period
-                        print(f"Alternative period: {alt_period}")
-                        
-                        async with session.get(url, params=alt_params, headers=headers) as alt_response:
-                            if alt_response.status == 200:
-                                data = await alt_response.json()
-                                users = data.get('data', [])
-                                print(f"Alternative request successful: {len(users)} users")
-                                
-                                for user_data in users:
-                                    try:
-                                        player_id = int(user_data.get('id', '0'))
-                                        name = user_data.get('attributes', {}).get('name', '')
-                                        value = int(user_data.get('attributes', {}).get('value', '0'))
-                                        
-                                        if player_id and name and value:
-                                            player = Player(name, player_id, value)
-                                            players.append(player)
-                                    except (ValueError, TypeError) as e:
-                                        print(f"Error parsing player data: {e}")
-                                        continue
-                            else:
-                                alt_error = await alt_response.text()
-                                print(f"Alternative request also failed: {alt_response.status}")
-                                print(f"Alternative response: {alt_error}")
-        except Exception as e:
-            print(f"Error fetching data from {url}: {e}")
     
-    async def _remove_duplicate_players(self, players: List[Player]) -> List[Player]:
-        """Видаляє дублікати гравців, сумуючи їх час онлайн"""
-        unique_players = {}
+    async def fetch_window(self, period: str, alt_period: Optional[str] = None) -> Optional[Dict[int, List[Row]]]:
+        """Читає всі сторінки всіх серверів за період; повертає None якщо хоч один сервер не відповів"""
+        log.info("Fetching window: %s", period)
+        paginators = self._make_paginators(period, alt_period)
         
-        for player in players:
-            if player.id in unique_players:
-                unique_players[player.id].value += player.value
-            else:
-                unique_players[player.id] = player
+        async def drain(paginator: LeaderboardPaginator) -> List[Row]:
+            rows = []
+            while not paginator.exhausted:
+                rows.extend(await paginator.fetch_next())
+            return rows
+        
+        results = await asyncio.gather(*(drain(paginator) for paginator in paginators))
+        self._log_server_stats(paginators)
+        self.period_rejected = self.period_rejected or any(paginator.period_rejected for paginator in paginators)
         
-        return list(unique_players.values())
+        if any(paginator.error for paginator in paginators):
+            return None
+        return {paginator.server_id: rows for paginator, rows in zip(paginators, results)}
     
-    async def _fetch_steam_ids_for_players(self, players: List[Player]):
-        """Отримує Steam ID для всіх гравців з обмеженням запитів"""
-        semaphore = asyncio.Semaphore(5)
+    async def fetch_population(self) -> Optional[int]:
+        """Повертає скільки гравців зараз онлайн на всіх серверах; None якщо хоч один сервер не відповів"""
+        async def server_players(server_id: int) -> Optional[int]:
+            try:
+                response = await self.client.get(f"/servers/{server_id}")
+                if response.status != 200:
+                    log.warning("Population request for server %s failed: HTTP %s", server_id, response.status)
+                    return None
+                return int(response.json()['data']['attributes'].get('players') or 0)
+            except Exception as e:
+                log.warning("Error fetching population of server %s: %s", server_id, e)
+                return None
         
-        async def fetch_with_semaphore(player):
-            async with semaphore:
-                await player.fetch_steam_id()
-                await asyncio.sleep(0.5)
+        counts = await asyncio.gather(*(server_players(server_id) for server_id in Settings.SERVER_IDS))
+        if any(count is None for count in counts):
+            return None
+        return sum(counts)
+    
+    def _make_paginators(self, period: str, alt_period: Optional[str] = None) -> List[LeaderboardPaginator]:
+        """Створює по одному пагінатору на кожен сервер з реєстру"""
+        params = {
+            'page[size]': str(Settings.LEADERBOARD_PAGE_SIZE),
+            'filter[period]': period
+        }
+        alt_params = None
+        if alt_period:
+            alt_params = dict(params)
+            alt_params['filter[period]'] = alt_period
         
-        batch_size = 20
-        for i in range(0, len(players), batch_size):
-            batch = players[i:i + batch_size]
-            print(f"Processing Steam ID batch {i//batch_size + 1}/{(len(players) + batch_size - 1)//batch_size} ({len(batch)} players)")
+        return [
+            LeaderboardPaginator(self.client, server_id, params, alt_params, max_pages=Settings.LEADERBOARD_MAX_PAGES)
+            for server_id in Settings.SERVER_IDS
+        ]
+    
+    def _log_server_stats(self, paginators: List[LeaderboardPaginator]):
+        for paginator in paginators:
+            status = f"failed: {paginator.error}" if paginator.error else paginator.status
+            log.info("Server %s: %d rows in %d pages, %.2fs (%s)",
+                     paginator.server_id, paginator.rows, paginator.pages, paginator.elapsed, status)
+    
+    async def _fetch_top_players(self, paginators: List[LeaderboardPaginator], top_n: int) -> List[Player]:
+        """Читає сторінки всіх серверів паралельно, сумує час гравців і зупиняється коли топ вже не зміниться"""
+        merger = TopKMerger()
+        
+        active = list(paginators)
+        while active:
+            # По одній сторінці з кожного сервера за раунд, всі сервери паралельно
+            pages = await asyncio.gather(*(paginator.fetch_next() for paginator in active))
             
-            tasks = [fetch_with_semaphore(player) for player in batch]
-            await asyncio.gather(*tasks)
+            for paginator, rows in zip(active, pages):
+                merger.add(paginators.index(paginator), rows)
             
-            if i + batch_size < len(players):
-                print(f"Waiting 3 seconds before next batch...")
-                await asyncio.sleep(3)
+            active = [paginator for paginator in paginators if not paginator.exhausted]
+            if active and top_n and top_n_is_settled(top_n, merger.totals, merger.seen, paginators):
+                log.info("Top %d is settled, skipping remaining pages", top_n)
+                break
+        
+        self._log_server_stats(paginators)
+        if any(paginator.error for paginator in paginators):
+            # Топ без одного з серверів виглядав би як нормальний результат - краще провалити оновлення
+            log.error("Leaderboard fetch incomplete, not returning a partial top")
+            return []
+        log.info("After deduplication: %d players", len(merger.totals))
+        
+        return [Player(name, player_id, value) for player_id, name, value in merger.top(top_n or None)]
+    
+    async def resolve_steam_ids(self, players: List[Player], limit: int = Settings.STEAM_ID_RESOLVE_N):
+        """Заповнює Steam ID перших limit гравців (кеш, потім API); решта лишається з steam_id = 0"""
+        players = players[:limit]
+        with refresh_phase_seconds.time(phase='steam_ids'):
+            await self._fetch_steam_ids_for_players(players)
+        
+        steam_ids_found = sum(1 for p in players if p.steam_id != 0)
+        log.info("Steam IDs found: %d/%d", steam_ids_found, len(players))
+    
+    async def _fetch_steam_ids_for_players(self, players: List[Player]):
+        """Отримує Steam ID для всіх гравців: кеш, потім пачками, і поодинці тільки для решти"""
+        steam_ids = await self.steam_ids.resolve(player.id for player in players)
+        for player in players:
+            player.steam_id = steam_ids.get(player.id, 0)
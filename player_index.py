@@ -0,0 +1,194 @@
+import logging
+import re
+import unicodedata
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from data_cache import CacheGeneration, DataCache, data_cache
+from leaderboard import Leaderboard
+
+log = logging.getLogger(__name__)
+
+# Кириличні літери, які виглядають як латинські - гравці пишуть нік то так, то так
+_HOMOGLYPHS = str.maketrans({
+    'а': 'a', 'в': 'b', 'е': 'e', 'ё': 'e', 'і': 'i', 'ї': 'i', 'ј': 'j', 'к': 'k', 'м': 'm', 'н': 'h',
+    'о': 'o', 'р': 'p', 'с': 'c', 'т': 't', 'у': 'y', 'х': 'x', 'ѕ': 's', 'ԁ': 'd', 'ɡ': 'g'
+})
+_SEPARATORS = re.compile(r'[\W_]+')
+
+def normalize_name(name: str) -> str:
+    """Нік для пошуку: NFKC, casefold, однакові на вигляд кириличні/латинські літери, без розділових знаків"""
+    folded = unicodedata.normalize('NFKC', name).casefold().translate(_HOMOGLYPHS)
+    return _SEPARATORS.sub(' ', folded).strip()
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class PlayerEntry:
+    """Гравець у індексі: місце і час у поточному та попередньому місяці"""
+
+    __slots__ = ('player_id', 'name', 'normalized', 'steam_id',
+                 'current_rank', 'current_value', 'previous_rank', 'previous_value')
+
+    def __init__(self, player_id: int, name: str):
+        self.player_id = player_id
+        self.name = name
+        self.normalized = normalize_name(name)
+        self.steam_id = 0
+        self.current_rank: Optional[int] = None
+        self.current_value = 0
+        self.previous_rank: Optional[int] = None
+        self.previous_value = 0
+
+    @property
+    def delta(self) -> int:
+        """Різниця часу з попереднім місяцем (в секундах)"""
+        return self.current_value - self.previous_value
+
+    @property
+    def best_rank(self) -> int:
+        return self.current_rank or (100000 + (self.previous_rank or 100000))
+
+class PlayerIndex:
+    """Індекс гравців з кешованих лідербордів: ID, Steam ID і триграми нормалізованих ніків"""
+
+    MAX_RESULTS = 25  # Ліміт варіантів автодоповнення в Discord
+
+    def __init__(self, cache: DataCache):
+        self.cache = cache
+        self.generation = -1
+        self._entries: Dict[int, PlayerEntry] = {}
+        self._by_steam_id: Dict[int, int] = {}
+        self._trigrams: Dict[str, Set[int]] = {}
+
+    def __len__(self) -> int:
+        self._sync()
+        return len(self._entries)
+
+    def update(self, generation: CacheGeneration):
+        """Приводить індекс до покоління: змінює тільки гравців, які з'явились, зникли або змінили нік"""
+        if generation.number == self.generation:
+            return
+
+        stats = {'added': 0, 'renamed': 0, 'removed': 0}
+        present: Set[int] = set()
+        for entry in self._entries.values():
+            entry.current_rank = entry.previous_rank = None
+            entry.current_value = entry.previous_value = 0
+
+        for board, is_current in ((generation.current_month, True), (generation.previous_month, False)):
+            for rank, player_id, name, value, steam_id in self._rows(board):
+                entry = self._entries.get(player_id)
+                if entry is None:
+                    entry = self._entries[player_id] = PlayerEntry(player_id, name)
+                    self._add_trigrams(entry)
+                    stats['added'] += 1
+                elif is_current and entry.name != name:
+                    # Нік поточного місяця важливіший за старий
+                    self._remove_trigrams(entry)
+                    entry.name = name
+                    entry.normalized = normalize_name(name)
+                    self._add_trigrams(entry)
+                    stats['renamed'] += 1
+
+                if is_current:
+                    entry.current_rank, entry.current_value = rank, value
+                elif entry.previous_rank is None:
+                    entry.previous_rank, entry.previous_value = rank, value
+                if steam_id and entry.steam_id != steam_id:
+                    # Старий Steam ID більше не веде до цього гравця
+                    if self._by_steam_id.get(entry.steam_id) == player_id:
+                        del self._by_steam_id[entry.steam_id]
+                    entry.steam_id = steam_id
+                    self._by_steam_id[steam_id] = player_id
+                present.add(player_id)
+
+        for player_id in [player_id for player_id in self._entries if player_id not in present]:
+            entry = self._entries.pop(player_id)
+            self._remove_trigrams(entry)
+            if self._by_steam_id.get(entry.steam_id) == player_id:
+                del self._by_steam_id[entry.steam_id]
+            stats['removed'] += 1
+
+        self.generation = generation.number
+        log.info("Player index at generation %d: %d players (%d added, %d renamed, %d removed)",
+                 generation.number, len(self._entries), stats['added'], stats['renamed'], stats['removed'])
+
+    def get(self, player_id: int) -> Optional[PlayerEntry]:
+        self._sync()
+        return self._entries.get(player_id)
+
+    def find(self, query: str) -> Optional[PlayerEntry]:
+        """Найкращий збіг для запиту (ID, Steam ID або нік)"""
+        results = self.search(query, limit=1)
+        return results[0] if results else None
+
+    def search(self, query: str, limit: int = MAX_RESULTS) -> List[PlayerEntry]:
+        """Шукає гравців: точний ID/Steam ID, потім точний нік, префікс, підрядок і нечіткий збіг за триграмами"""
+        self._sync()
+        query = query.strip()
+        if not query:
+            # Порожній запит в автодоповненні - просто верх топу
+            return sorted(self._entries.values(), key=lambda entry: entry.best_rank)[:limit]
+
+        if query.isdigit():
+            number = int(query)
+            entry = self._entries.get(number) or self._entries.get(self._by_steam_id.get(number, 0))
+            if entry is not None:
+                return [entry]
+
+        normalized = normalize_name(query)
+        if not normalized:
+            return []
+
+        scored: List[Tuple[int, float, int, PlayerEntry]] = []
+        for entry, overlap in self._candidates(normalized):
+            if entry.normalized == normalized:
+                kind = 0
+            elif entry.normalized.startswith(normalized):
+                kind = 1
+            elif normalized in entry.normalized:
+                kind = 2
+            else:
+                kind = 3
+            scored.append((kind, -overlap, entry.best_rank, entry))
+        scored.sort(key=lambda item: item[:3])
+        return [entry for _, _, _, entry in scored[:limit]]
+
+    def _candidates(self, normalized: str) -> Iterator[Tuple[PlayerEntry, float]]:
+        grams = trigrams(normalized)
+        counts: Dict[int, int] = {}
+        for gram in grams:
+            for player_id in self._trigrams.get(gram, ()):
+                counts[player_id] = counts.get(player_id, 0) + 1
+
+        # Нечіткі збіги - тільки якщо спільна хоча б половина триграм (інакше шум)
+        threshold = max(1, len(grams) // 2)
+        for player_id, count in counts.items():
+            entry = self._entries[player_id]
+            if count >= threshold or normalized in entry.normalized:
+                yield entry, count / len(grams)
+
+    def _sync(self):
+        generation = self.cache.snapshot()
+        if generation.number != self.generation:
+            self.update(generation)
+
+    def _add_trigrams(self, entry: PlayerEntry):
+        for gram in trigrams(entry.normalized):
+            self._trigrams.setdefault(gram, set()).add(entry.player_id)
+
+    def _remove_trigrams(self, entry: PlayerEntry):
+        for gram in trigrams(entry.normalized):
+            posting = self._trigrams.get(gram)
+            if posting is not None:
+                posting.discard(entry.player_id)
+                if not posting:
+                    del self._trigrams[gram]
+
+    @staticmethod
+    def _rows(board: Leaderboard) -> Iterator[Tuple[int, int, str, int, int]]:
+        """(місце, player_id, нік, час, steam_id) прямо з колонок лідерборду, без об'єктів Player"""
+        return zip(range(1, len(board) + 1), board.ids, board.names, board.values, board.steam_ids)
+
+# Глобальний індекс гравців
+player_index = PlayerIndex(data_cache)
@@ -0,0 +1,73 @@
+import asyncio
+import time
+from typing import Dict
+from settings import Settings
+
+class RateLimiter:
+    """Глобальний token bucket для всіх запитів до Battlemetrics з підтримкою Retry-After"""
+
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60.0  # токенів за секунду
+        self.capacity = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        # Замок робить чергу FIFO - хто першим прийшов, той першим отримає токен
+        self._lock = asyncio.Lock()
+
+        # Лічильники для діагностики
+        self.requests = 0
+        self.delayed = 0
+        self.wait_seconds = 0.0
+        self.rate_limited = 0
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    async def acquire(self):
+        """Чекає поки з'явиться вільний токен (або закінчиться глобальна пауза)"""
+        async with self._lock:
+            waited = 0.0
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        break
+                    delay = (1 - self._tokens) / self.rate
+
+                waited += delay
+                await asyncio.sleep(delay)
+
+            self.requests += 1
+            if waited > 0:
+                self.delayed += 1
+                self.wait_seconds += waited
+
+    def backoff(self, retry_after: float):
+        """Ставить на паузу всі запити (і ті що в черзі) після відповіді 429"""
+        self.rate_limited += 1
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + retry_after)
+        # Після паузи починаємо з порожнього відра, щоб не вдарити сервер залпом
+        self._tokens = 0.0
+        self._updated = max(self._updated, self._paused_until)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Повертає лічильники лімітера"""
+        return {
+            'requests': self.requests,
+            'delayed': self.delayed,
+            'wait_seconds': round(self.wait_seconds, 3),
+            'rate_limited': self.rate_limited,
+            'paused_for': round(max(0.0, self._paused_until - time.monotonic()), 3)
+        }
+
+# Глобальний лімітер для всіх запитів до Battlemetrics
+rate_limiter = RateLimiter(Settings.BM_RATE_LIMIT_PER_MINUTE, Settings.BM_RATE_LIMIT_BURST)
@@ -0,0 +1,84 @@
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+from settings import Settings
+from rate_limiter import RateLimiter, rate_limiter
+from parser import Parser
+
+log = logging.getLogger(__name__)
+
+class AdaptiveRefreshScheduler:
+    """Підбирає інтервал оновлення під активність: рідше коли нічого не змінюється, частіше під навантаженням"""
+
+    def __init__(self, limiter: RateLimiter = rate_limiter,
+                 min_interval: float = Settings.REFRESH_MIN_INTERVAL,
+                 max_interval: float = Settings.REFRESH_MAX_INTERVAL):
+        self.limiter = limiter
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = float(Settings.DATA_UPDATE_INTERVAL)
+
+        # Що бачили минулого разу - для підрахунку дельти між поколіннями
+        self._last_generation = -1
+        self._last_values: Dict[int, int] = {}
+        self._last_built_at: Optional[datetime] = None
+        self._last_requests = limiter.requests
+
+        # Останні спостереження (для /cachestatus і діагностики)
+        self.last_delta = 0
+        self.last_rate = 0.0
+        self.last_population: Optional[int] = None
+
+    async def schedule(self, generation, parser: Optional[Parser] = None) -> float:
+        """Після оновлення: за бажанням питає онлайн серверів і рахує наступний інтервал"""
+        if not Settings.ADAPTIVE_REFRESH:
+            return self.plan(generation)
+
+        population = None
+        if Settings.ADAPTIVE_USE_POPULATION:
+            population = await (parser or Parser()).fetch_population()
+        interval = self.plan(generation, population)
+        log.info("🦍 Next refresh in %ds (delta %ds, rate %.2f/s, online %s)", interval, self.last_delta, self.last_rate, population)
+        return interval
+
+    def plan(self, generation, population: Optional[int] = None) -> float:
+        """Враховує нове покоління і повертає інтервал до наступного оновлення (в секундах)"""
+        requests_used = self.limiter.requests - self._last_requests
+        self._last_requests = self.limiter.requests
+        self.last_population = population
+
+        if not Settings.ADAPTIVE_REFRESH:
+            self.interval = float(Settings.DATA_UPDATE_INTERVAL)
+        elif generation.number != self._last_generation and generation.built_at:
+            board = generation.current_month
+            values = dict(zip(board.ids, board.values))
+
+            if self._last_built_at is not None:
+                elapsed = max(1.0, (generation.built_at - self._last_built_at).total_seconds())
+                # Скільки секунд гри додали гравці топу з минулого покоління
+                delta = sum(max(0, value - self._last_values.get(player_id, value)) for player_id, value in values.items())
+                self.last_delta = delta
+                self.last_rate = delta / elapsed
+                self.interval = self._next_interval(population)
+
+            self._last_generation = generation.number
+            self._last_values = values
+            self._last_built_at = generation.built_at
+
+        # Не витрачаємо більше своєї частки ліміту Battlemetrics, скільки б не було активності
+        budget_floor = requests_used / (self.limiter.rate * Settings.REFRESH_BUDGET_SHARE)
+        self.interval = max(self.interval, budget_floor)
+        return self.interval
+
+    def _next_interval(self, population: Optional[int]) -> float:
+        # Кожен гравець онлайн додає секунду гри за секунду - population теж дає оцінку активності
+        rate = max(self.last_rate, float(population or 0))
+        if rate <= 0:
+            # Нічого не рухається - поступово розтягуємо інтервал
+            interval = self.interval * 2
+        else:
+            interval = Settings.REFRESH_TARGET_DELTA / rate
+        return float(min(self.max_interval, max(self.min_interval, interval)))
+
+# Глобальний планувальник оновлень
+refresh_scheduler = AdaptiveRefreshScheduler()
@@ -0,0 +1,114 @@
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from settings import Settings
+from aggregator import Row, ServerSplit, top_k
+
+log = logging.getLogger(__name__)
+
+# Чисті функції етапів - їх можна виконувати в пулі воркерів (worker_pool), зокрема в іншому процесі
+
+def merge_windows(windows: List[Tuple[int, List[Row]]]) -> Tuple[ServerSplit, Dict[int, str]]:
+    """Сумує рядки (server_id, rows) по гравцях і серверах з нуля - для повної звірки"""
+    totals: ServerSplit = {}
+    names: Dict[int, str] = {}
+    for server_id, rows in windows:
+        for player_id, name, value in rows:
+            servers = totals.get(player_id)
+            if servers is None:
+                servers = totals[player_id] = {}
+            servers[server_id] = servers.get(server_id, 0) + value
+            names[player_id] = name
+    return totals, names
+
+def rank_totals(totals: ServerSplit, names: Dict[int, str], top_n: int) -> List[Row]:
+    """Топ гравців за сумою по всіх серверах"""
+    sums = {player_id: sum(servers.values()) for player_id, servers in totals.items()}
+    return [(player_id, names[player_id], value) for player_id, value in top_k(sums, top_n)]
+
+class RunningTotals:
+    """Накопичений час гравців за поточний місяць по кожному серверу, збережений на диску"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.month_key: Optional[str] = None
+        # Кінець останнього успішно врахованого вікна - звідси починається наступна дельта
+        self.window_end: Optional[datetime] = None
+        self.last_full: Optional[datetime] = None
+        # player_id -> {server_id: seconds}
+        self.totals: ServerSplit = {}
+        self.names: Dict[int, str] = {}
+        self._mtime: Optional[int] = None
+
+    def reset(self, month_key: str):
+        self.month_key = month_key
+        self.window_end = None
+        self.last_full = None
+        self.totals = {}
+        self.names = {}
+
+    def add_rows(self, server_id: int, rows: List[Row]):
+        """Додає дельти одного сервера (рядки лідерборду за вікно) до накопичених сум"""
+        for player_id, name, value in rows:
+            servers = self.totals.get(player_id)
+            if servers is None:
+                servers = self.totals[player_id] = {}
+            servers[server_id] = servers.get(server_id, 0) + value
+            # Нік беремо найсвіжіший - гравці інколи його змінюють
+            self.names[player_id] = name
+
+    def server_leaders(self, server_id: int, top_n: int) -> List[Row]:
+        """Повертає топ гравців тільки одного сервера"""
+        totals = {player_id: servers[server_id] for player_id, servers in self.totals.items() if servers.get(server_id)}
+        return [(player_id, self.names[player_id], value) for player_id, value in top_k(totals, top_n)]
+
+    def load(self) -> bool:
+        """Читає накопичені суми з диску; повертає False якщо файлу немає або він зіпсований"""
+        if not os.path.exists(self.path):
+            return False
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.month_key = data['month']
+            self.window_end = datetime.fromisoformat(data['window_end']) if data.get('window_end') else None
+            self.last_full = datetime.fromisoformat(data['last_full']) if data.get('last_full') else None
+            self.totals = {
+                int(player_id): {int(server_id): value for server_id, value in servers.items()}
+                for player_id, servers in data['totals'].items()
+            }
+            self.names = {int(player_id): name for player_id, name in data['names'].items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            # Зіпсований або чужий файл - починаємо з нуля, повна звірка перебудує суми
+            log.warning("🦍 Could not read running totals %s: %s", self.path, e)
+            self.reset(None)
+            return False
+
+        log.info("🦍 Loaded running totals for %s: %d players up to %s", self.month_key, len(self.totals), self.window_end)
+        return True
+
+    def reload_if_changed(self) -> bool:
+        """Для процесів, які тільки читають (BOT_MODE=consumer): перечитує файл, якщо фетчер його переписав"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        return self.load()
+
+    def to_dict(self) -> Dict:
+        """Стан для запису на диск (посилання на ті самі словники, без копіювання)"""
+        return {
+            'month': self.month_key,
+            'window_end': self.window_end.isoformat() if self.window_end else None,
+            'last_full': self.last_full.isoformat() if self.last_full else None,
+            'totals': self.totals,
+            'names': self.names
+        }
+
+# Глобальні накопичені суми поточного місяця
+running_totals = RunningTotals(Settings.RUNNING_TOTALS_PATH)
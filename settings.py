@@ -8,6 +8,14 @@ class Settings:
     SERVER_ID_SQ_3 = 31020814
     SERVER_ID_SQ_2 = 4256648
     
+    # Короткі назви серверів для команд і embed
+    SERVER_NAMES = {SERVER_ID_SQ_1: 'SQ1', SERVER_ID_SQ_2: 'SQ2', SERVER_ID_SQ_3: 'SQ3'}
+    
+    # Сервери, чиї лідерборди об'єднуються в топ (можна перевизначити через SERVER_IDS="id1,id2,...")
+    SERVER_IDS: List[int] = [
+        int(server_id) for server_id in os.getenv('SERVER_IDS', f'{SERVER_ID_SQ_1},{SERVER_ID_SQ_2}').split(',') if server_id.strip()
+    ]
+    
     # Список Discord ID користувачів які можуть використовувати ВСІ команди (окрім randomsquadname)
     ALLOWED_USER_IDS: List[int] = [
         1344598543440019538,
@@ -17,8 +25,105 @@ class Settings:
         1397901457012822018
     ]
     
-    # Канал для автоматичних оновлень топу (встановіть ID каналу)
-    AUTO_UPDATE_CHANNEL_ID = None  # Замініть на ID каналу де хочете автооновлення
+    # Автооновлення топу: скільки повідомлень редагуємо одночасно
+    AUTO_TOP_CONCURRENCY = 5
+    
+    # Інкрементальне оновлення: тягнемо тільки вікно з моменту останнього оновлення
+    INCREMENTAL_REFRESH = os.getenv('INCREMENTAL_REFRESH', '1') == '1'
+    FULL_RECONCILE_INTERVAL = 24 * 3600  # Повна звірка поточного місяця раз на добу
     
     # Інтервал оновлення даних (в секундах)
-    DATA_UPDATE_INTERVAL = 600  # 10 хвилин
+    DATA_UPDATE_INTERVAL = 60 if INCREMENTAL_REFRESH else 600  # 1 хвилина (або 10 без інкрементального режиму)
+    
+    # Адаптивний інтервал: частіше коли гравці активні, рідше коли на серверах порожньо
+    ADAPTIVE_REFRESH = os.getenv('ADAPTIVE_REFRESH', '1') == '1'
+    ADAPTIVE_USE_POPULATION = os.getenv('ADAPTIVE_USE_POPULATION', '1') == '1'  # Питати онлайн серверів (+1 запит на сервер)
+    REFRESH_MIN_INTERVAL = DATA_UPDATE_INTERVAL  # Не частіше базового інтервалу
+    REFRESH_MAX_INTERVAL = 1800  # Навіть на порожніх серверах оновлюємось хоча б раз на пів години
+    REFRESH_TARGET_DELTA = 600  # Скільки секунд гри (сумарно) має накопичитись до наступного оновлення
+    REFRESH_BUDGET_SHARE = 0.5  # Яку частку ліміту запитів Battlemetrics можуть з'їдати фонові оновлення
+    
+    # Параметри HTTP клієнта Battlemetrics
+    BM_API_URL = os.getenv('BM_API_URL', 'https://api.battlemetrics.com')
+    BM_MAX_CONNECTIONS = 20  # Загальний ліміт з'єднань в пулі
+    BM_MAX_CONNECTIONS_PER_HOST = 10  # Ліміт з'єднань до одного хоста
+    BM_KEEPALIVE_TIMEOUT = 60  # Скільки секунд тримаємо вільне з'єднання відкритим
+    BM_DNS_CACHE_TTL = 300  # Кеш DNS (в секундах)
+    BM_REQUEST_TIMEOUT = 30  # Загальний таймаут запиту (в секундах)
+    
+    # Ліміти запитів Battlemetrics (опубліковані: 60 запитів/хв, до 15 запитів/сек)
+    BM_RATE_LIMIT_PER_MINUTE = float(os.getenv('BM_RATE_LIMIT_PER_MINUTE', '60'))
+    BM_RATE_LIMIT_BURST = int(os.getenv('BM_RATE_LIMIT_BURST', '15'))
+    BM_MAX_RETRIES = 3  # Скільки разів повторюємо запит після 429
+    BM_DEFAULT_RETRY_AFTER = 10  # Пауза якщо сервер не прислав Retry-After (в секундах)
+    
+    # Парсер JSON відповідей: auto (msgspec > orjson > stdlib, що встановлено), msgspec, orjson або stdlib
+    JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto').lower()
+    
+    # Розмір топу і ліміт сторінок лідерборду на один сервер
+    LEADERBOARD_TOP_N = 100
+    LEADERBOARD_PAGE_SIZE = 100  # Максимум який дозволяє Battlemetrics
+    LEADERBOARD_MAX_PAGES = 50
+    LEADERBOARD_STORE_N = int(os.getenv('LEADERBOARD_STORE_N', '1000'))  # Скільки гравців тримаємо в кеші для посторінкового /top
+    LEADERBOARD_PAGE_ROWS = 20  # Рядків на одній сторінці embed
+    LEADERBOARD_PAGER_TIMEOUT = 900  # Скільки секунд кнопки гортання працюють після команди
+    
+    # Каталог для локальних даних бота (кеші, знімки)
+    DATA_DIR = os.getenv('DATA_DIR', 'data')
+    
+    # Знімок кешу для швидкого старту після перезапуску
+    CACHE_SNAPSHOT_PATH = os.path.join(DATA_DIR, 'cache_snapshot.json')
+    
+    # Розділення на фетчер і бот-процеси: 'standalone' - бот сам тягне дані з Battlemetrics,
+    # 'consumer' - бот тільки читає знімки, які публікує fetcher.py (запити до API не залежать від кількості ботів)
+    BOT_MODE = os.getenv('BOT_MODE', 'standalone')
+    SNAPSHOT_SOCKET = os.getenv('SNAPSHOT_SOCKET', os.path.join(DATA_DIR, 'snapshots.sock'))  # Сповіщення про нові знімки
+    SNAPSHOT_POLL_INTERVAL = 15  # Якщо сокет недоступний - як часто перевіряємо, чи змінився файл знімка (сек)
+    SNAPSHOT_REFRESH_TIMEOUT = 300  # Скільки /updatecache у consumer чекає на нове покоління від фетчера (сек)
+    # Редагує повідомлення автотопу тільки один бот-процес - у решти consumer-процесів AUTO_TOP_OWNER=0
+    AUTO_TOP_OWNER = os.getenv('AUTO_TOP_OWNER', '1') == '1'
+    
+    # Архів закритих місяців (знімки лідерборду, які вже ніколи не змінюються)
+    MONTH_ARCHIVE_DIR = os.path.join(DATA_DIR, 'months')
+    MONTH_FREEZE_GRACE = 3600  # Скільки секунд після закінчення місяця ще перезавантажуємо його дані
+    
+    # Накопичені суми поточного місяця для інкрементального оновлення
+    RUNNING_TOTALS_PATH = os.path.join(DATA_DIR, 'current_month.json')
+    
+    # Денна активність гравців по серверах (один файл на день) для /activity, /weektop, /servertop
+    ACTIVITY_DIR = os.path.join(DATA_DIR, 'activity')
+    ACTIVITY_RETENTION_DAYS = 35  # Скільки днів тримаємо (тиждень + запас на місяць)
+    
+    # Історія лідерборду (знімки для /history, /monthago, /trajectory)
+    HISTORY_DB_PATH = os.path.join(DATA_DIR, 'history.sqlite3')
+    HISTORY_MIN_INTERVAL = 600  # Не частіше одного знімка на 10 хвилин
+    
+    # Підписки на автооновлення топу (гільдія, канал, повідомлення, вигляд)
+    SUBSCRIPTIONS_PATH = os.path.join(DATA_DIR, 'subscriptions.json')
+    
+    # Кеш відповідностей Battlemetrics ID -> Steam ID
+    STEAM_ID_CACHE_PATH = os.path.join(DATA_DIR, 'steam_ids.sqlite3')
+    STEAM_ID_MISS_TTL = 24 * 3600  # Скільки секунд пам'ятаємо що Steam ID не знайдено
+    STEAM_ID_BULK = os.getenv('STEAM_ID_BULK', '1') == '1'  # Шукати Steam ID пачками через /players?filter[ids]=...
+    STEAM_ID_BATCH_SIZE = 100  # Скільки гравців в одному запиті
+    # Steam ID шукаємо тільки для верхівки топу, яку показують адмін-вигляди (а не для всіх LEADERBOARD_STORE_N)
+    STEAM_ID_RESOLVE_N = int(os.getenv('STEAM_ID_RESOLVE_N', str(LEADERBOARD_TOP_N)))
+    
+    # Логування: DEBUG показує деталі по кожному гравцю, INFO - підсумки оновлень
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    
+    # Метрики у форматі Prometheus: HTTP endpoint (METRICS_PORT=0 - вимкнено) і/або файл для node_exporter
+    METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+    METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+    METRICS_FILE = os.getenv('METRICS_FILE', '')
+    METRICS_FILE_INTERVAL = 15  # Як часто перезаписуємо файл метрик (в секундах)
+    
+    # Моніторинг затримки event loop
+    LOOP_LAG_INTERVAL = 1.0  # Як часто перевіряємо (в секундах)
+    LOOP_LAG_WARN = 0.5  # Затримка, після якої пишемо попередження (в секундах)
+    
+    # Пул для CPU-важких етапів оновлення (звірка, ранжування, серіалізація):
+    # 'thread', 'process' або 'inline' (прямо в event loop)
+    WORKER_POOL = os.getenv('WORKER_POOL', 'thread')
+    WORKER_POOL_SIZE = int(os.getenv('WORKER_POOL_SIZE', '2'))
+    WORKER_POOL_MIN_ITEMS = int(os.getenv('WORKER_POOL_MIN_ITEMS', '2000'))  # Менші обсяги дешевше порахувати на місці
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Optional, Set
+from settings import Settings
+from data_cache import CacheGeneration, DataCache, data_cache
+
+log = logging.getLogger(__name__)
+
+# Протокол сокета - JSON рядки:
+#   фетчер -> бот: {"generation": N, "built_at": "..."} після кожного нового знімка (і одразу після підключення)
+#   бот -> фетчер: {"command": "refresh"} - позачергове оновлення (/updatecache у боті)
+
+class SnapshotPublisher:
+    """Фетчер: після кожного покоління повідомляє бот-процеси через Unix-сокет, що знімок на диску оновився"""
+
+    def __init__(self, cache: DataCache, socket_path: str = Settings.SNAPSHOT_SOCKET):
+        self.cache = cache
+        self.socket_path = socket_path
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients: Set[asyncio.StreamWriter] = set()
+        self._subscribed = False
+
+    async def start(self):
+        directory = os.path.dirname(self.socket_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Сокет від попереднього запуску фетчера заважає bind
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self._server = await asyncio.start_unix_server(self._handle_client, self.socket_path)
+        if not self._subscribed:
+            self.cache.subscribe(self._on_generation)
+            self._subscribed = True
+        log.info("🦍 Publishing snapshots on %s", self.socket_path)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for writer in list(self._clients):
+            writer.close()
+        self._clients.clear()
+
+    def _message(self, generation: CacheGeneration) -> bytes:
+        return json.dumps({
+            'generation': generation.number,
+            'built_at': generation.built_at.isoformat() if generation.built_at else None
+        }).encode() + b'\n'
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._clients.add(writer)
+        log.info("🦍 Bot connected to snapshot feed (%d connected)", len(self._clients))
+        try:
+            # Новий бот одразу дізнається, яке покоління зараз на диску
+            if self.cache.generation.built_at:
+                writer.write(self._message(self.cache.generation))
+                await writer.drain()
+            while line := await reader.readline():
+                try:
+                    command = json.loads(line).get('command')
+                except (ValueError, AttributeError):
+                    log.debug("Bad message on snapshot feed: %r", line)
+                    continue
+                if command == 'refresh':
+                    log.info("🦍 Refresh requested by a bot")
+                    # Якщо оновлення вже йде - update_data просто дочекається його
+                    asyncio.create_task(self.cache.update_data())
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+            log.info("🦍 Bot disconnected from snapshot feed (%d connected)", len(self._clients))
+
+    async def _on_generation(self, generation: CacheGeneration):
+        message = self._message(generation)
+        for writer in list(self._clients):
+            try:
+                writer.write(message)
+                # Повільний бот не повинен затримувати інших - знімок він і так прочитає з диску
+                await asyncio.wait_for(writer.drain(), timeout=5)
+            except (ConnectionError, asyncio.TimeoutError) as e:
+                log.warning("🦍 Dropping snapshot feed client: %s", e)
+                self._clients.discard(writer)
+                writer.close()
+
+class SnapshotFollower:
+    """Бот у режимі consumer: підхоплює знімки фетчера (тільки читання)
+
+    Нове покоління приходить сповіщенням через сокет; якщо фетчер недоступний по сокету
+    (інший хост зі спільним диском, перезапуск), перевіряємо mtime файлу знімка.
+    """
+
+    def __init__(self, cache: DataCache, socket_path: str = Settings.SNAPSHOT_SOCKET,
+                 snapshot_path: str = Settings.CACHE_SNAPSHOT_PATH, poll_interval: float = Settings.SNAPSHOT_POLL_INTERVAL):
+        self.cache = cache
+        self.socket_path = socket_path
+        self.snapshot_path = snapshot_path
+        self.poll_interval = poll_interval
+        self.connected = False
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._mtime: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._new_generation = asyncio.Event()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def check(self) -> bool:
+        """Перечитує знімок, якщо файл змінився; True - якщо підхоплено нове покоління"""
+        try:
+            mtime = os.stat(self.snapshot_path).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        if not self.cache.adopt_snapshot():
+            return False
+        self._new_generation.set()
+        return True
+
+    async def request_refresh(self, timeout: float = Settings.SNAPSHOT_REFRESH_TIMEOUT) -> bool:
+        """Просить фетчер оновитись і чекає на нове покоління"""
+        if self._writer is None:
+            return False
+        before = self.cache.generation.number
+        self._writer.write(json.dumps({'command': 'refresh'}).encode() + b'\n')
+        await self._writer.drain()
+        try:
+            while self.cache.generation.number == before:
+                self._new_generation.clear()
+                await asyncio.wait_for(self._new_generation.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _run(self):
+        self.check()
+        while True:
+            try:
+                reader, self._writer = await asyncio.open_unix_connection(self.socket_path)
+            except OSError as e:
+                log.debug("Snapshot feed unavailable (%s), polling %s", e, self.snapshot_path)
+                await asyncio.sleep(self.poll_interval)
+                self.check()
+                continue
+
+            self.connected = True
+            log.info("🦍 Following snapshots from %s", self.socket_path)
+            try:
+                while await reader.readline():
+                    # Вміст сповіщення не важливий - джерело правди завжди файл знімка
+                    self.check()
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                log.warning("🦍 Snapshot feed connection lost: %s", e)
+            finally:
+                self.connected = False
+                self._writer.close()
+                self._writer = None
+            log.info("🦍 Snapshot feed closed, polling until the fetcher is back")
+            await asyncio.sleep(self.poll_interval)
+
+# Глобальні видавець (для fetcher.py) і підписник (для бота з BOT_MODE=consumer)
+snapshot_publisher = SnapshotPublisher(data_cache)
+snapshot_follower = SnapshotFollower(data_cache)
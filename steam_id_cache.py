@@ -0,0 +1,101 @@
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, Iterable, Optional, Tuple
+from settings import Settings
+from metrics import metrics, set_cache_lookups
+
+log = logging.getLogger(__name__)
+
+class SteamIdCache:
+    """Постійний кеш відповідностей Battlemetrics ID -> Steam ID на диску (SQLite)"""
+
+    def __init__(self, path: str, miss_ttl: int = Settings.STEAM_ID_MISS_TTL):
+        self.path = path
+        self.miss_ttl = miss_ttl
+        # player_id -> (steam_id, resolved_at); steam_id == 0 означає "не знайдено"
+        self._entries: Dict[int, Tuple[int, float]] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+
+    def load(self):
+        """Відкриває базу і завантажує всі записи в пам'ять"""
+        if self._conn is not None:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS steam_ids ("
+            "player_id INTEGER PRIMARY KEY, "
+            "steam_id INTEGER NOT NULL, "
+            "resolved_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+        for player_id, steam_id, resolved_at in self._conn.execute(
+            "SELECT player_id, steam_id, resolved_at FROM steam_ids"
+        ):
+            self._entries[player_id] = (steam_id, resolved_at)
+
+        log.info("Steam ID cache loaded: %d entries from %s", len(self._entries), self.path)
+
+    def get(self, player_id: int) -> Optional[int]:
+        """Повертає Steam ID (0 якщо відомо що його немає) або None якщо треба питати API"""
+        self.load()
+        entry = self._entries.get(player_id)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        steam_id, resolved_at = entry
+        if steam_id == 0 and time.time() - resolved_at > self.miss_ttl:
+            # Негативний запис застарів - пробуємо ще раз
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return steam_id
+
+    def set(self, player_id: int, steam_id: int):
+        """Зберігає результат пошуку (steam_id = 0 для негативного кешування)"""
+        self.load()
+        resolved_at = time.time()
+        self._entries[player_id] = (steam_id, resolved_at)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO steam_ids (player_id, steam_id, resolved_at) VALUES (?, ?, ?)",
+            (player_id, steam_id, resolved_at)
+        )
+        self._conn.commit()
+
+    def set_many(self, items: Iterable[Tuple[int, int]]):
+        """Зберігає багато результатів одним комітом"""
+        self.load()
+        resolved_at = time.time()
+        rows = [(player_id, steam_id, resolved_at) for player_id, steam_id in items]
+        if not rows:
+            return
+        for player_id, steam_id, _ in rows:
+            self._entries[player_id] = (steam_id, resolved_at)
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO steam_ids (player_id, steam_id, resolved_at) VALUES (?, ?, ?)",
+            rows
+        )
+        self._conn.commit()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+# Глобальний екземпляр кешу Steam ID
+steam_id_cache = SteamIdCache(Settings.STEAM_ID_CACHE_PATH)
+metrics.add_collector(lambda: set_cache_lookups('steam_id', steam_id_cache.hits, steam_id_cache.misses))
@@ -0,0 +1,199 @@
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from settings import Settings
+from steam_id_cache import SteamIdCache, steam_id_cache
+from bm_client import BattleMetricsClient, bm_client
+
+log = logging.getLogger(__name__)
+
+def iter_steam_ids(included: Iterable[Dict[str, Any]], default_player_id: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+    """Проходить по масиву included і віддає (player_id, steam_id) для кожного ідентифікатора steamID
+
+    Власника ідентифікатора беремо з relationships.player; у відповіді на запит одного гравця
+    його може не бути - тоді це default_player_id.
+    """
+    for item in included:
+        if item.get('type') != 'identifier':
+            continue
+        attributes = item.get('attributes') or {}
+        if attributes.get('type') != 'steamID':
+            continue
+
+        owner = ((item.get('relationships') or {}).get('player') or {}).get('data') or {}
+        try:
+            player_id = int(owner['id']) if owner.get('id') else default_player_id
+            steam_id = int(attributes.get('identifier', ''))
+        except (TypeError, ValueError):
+            log.debug("Could not parse steamID identifier %s", item.get('id'))
+            continue
+        if player_id is not None:
+            yield player_id, steam_id
+
+class SteamIdResolver:
+    """Знаходить Steam ID пачками через /players?filter[ids]=..., а поодинці - тільки тих, кого пачка не повернула"""
+
+    def __init__(self, client: BattleMetricsClient = bm_client, cache: SteamIdCache = steam_id_cache,
+                 batch_size: int = Settings.STEAM_ID_BATCH_SIZE):
+        self.client = client
+        self.cache = cache
+        self.batch_size = batch_size
+        # Якщо API не приймає filter[ids] - більше не пробуємо і працюємо поодинці
+        self.bulk_enabled = Settings.STEAM_ID_BULK
+        # Гравці, яких вже шукають: повторний запит чекає на той самий результат
+        self._inflight: Dict[int, asyncio.Future] = {}
+
+    async def resolve(self, player_ids: Iterable[int]) -> Dict[int, int]:
+        """Повертає {player_id: steam_id} (0 - Steam ID немає); гравців, яких не вдалося знайти, у відповіді немає"""
+        result: Dict[int, int] = {}
+        waiting: Dict[int, asyncio.Future] = {}
+        owned: List[int] = []
+
+        for player_id in dict.fromkeys(player_ids):
+            cached = self.cache.get(player_id)
+            if cached is not None:
+                result[player_id] = cached
+            elif player_id in self._inflight:
+                waiting[player_id] = self._inflight[player_id]
+            else:
+                self._inflight[player_id] = asyncio.get_running_loop().create_future()
+                owned.append(player_id)
+
+        if owned:
+            log.info("Resolving %d Steam IDs (%d already in flight)", len(owned), len(waiting))
+            found: Dict[int, Optional[int]] = {}
+            try:
+                found = await self._resolve_uncached(owned)
+            finally:
+                for player_id in owned:
+                    future = self._inflight.pop(player_id)
+                    if not future.done():
+                        future.set_result(found.get(player_id))
+
+            result.update((player_id, steam_id) for player_id, steam_id in found.items() if steam_id is not None)
+
+        for player_id, future in waiting.items():
+            steam_id = await asyncio.shield(future)
+            if steam_id is not None:
+                result[player_id] = steam_id
+
+        return result
+
+    async def resolve_one(self, player_id: int, use_cache: bool = True) -> Optional[int]:
+        """Steam ID одного гравця: кеш (якщо use_cache), потім окремий запит"""
+        if use_cache:
+            return (await self.resolve([player_id])).get(player_id)
+        steam_id = await self._fetch_one(player_id)
+        if steam_id is not None:
+            self.cache.set(player_id, steam_id)
+        return steam_id
+
+    async def _resolve_uncached(self, player_ids: List[int]) -> Dict[int, Optional[int]]:
+        found: Dict[int, Optional[int]] = {}
+        stragglers = list(player_ids)
+
+        if self.bulk_enabled:
+            batches = [player_ids[i:i + self.batch_size] for i in range(0, len(player_ids), self.batch_size)]
+            for batch_result in await asyncio.gather(*(self._fetch_batch(batch) for batch in batches)):
+                found.update(batch_result)
+            stragglers = [player_id for player_id in player_ids if player_id not in found]
+            self.cache.set_many(found.items())
+
+        if stragglers:
+            log.info("Resolving %d Steam IDs one by one", len(stragglers))
+            # Темп задає глобальний лімітер клієнта, тому запускаємо всі запити одразу
+            single = await asyncio.gather(*(self._fetch_one(player_id) for player_id in stragglers))
+            resolved = {player_id: steam_id for player_id, steam_id in zip(stragglers, single) if steam_id is not None}
+            self.cache.set_many(resolved.items())
+            found.update(resolved)
+
+        return found
+
+    async def _fetch_batch(self, player_ids: List[int]) -> Dict[int, int]:
+        """Одна пачка гравців (з усіма сторінками); повертає тільки запитаних гравців, які були у відповіді"""
+        found: Dict[int, int] = {}
+        requested = set(player_ids)
+        url: Optional[str] = "/players"
+        params: Optional[Dict[str, str]] = {
+            'filter[ids]': ','.join(map(str, player_ids)),
+            'include': 'identifier',
+            'page[size]': str(self.batch_size)
+        }
+        # Якщо фільтр застосовано, запитані гравці вміщаються в стільки сторінок - далі не йдемо,
+        # інакше API без фільтра водив би нас по всій колекції /players
+        max_pages = -(-len(player_ids) // self.batch_size)
+
+        for _ in range(max_pages):
+            try:
+                response = await self.client.get(url, params=params)
+            except Exception as e:
+                log.warning("Bulk Steam ID request failed: %s", e)
+                return found
+
+            if response.status == 400 and not found:
+                log.warning("BattleMetrics rejected filter[ids], falling back to per-player Steam ID lookups")
+                self.bulk_enabled = False
+                return found
+            if response.status != 200:
+                log.warning("Bulk Steam ID request failed: HTTP %s", response.status)
+                return found
+
+            data = response.json()
+            players = data.get('data') or []
+            matched = 0
+            # Гравці зі сторінки без steamID теж відомі - це негативний результат, а не відсутність відповіді
+            for player in players:
+                try:
+                    player_id = int(player['id'])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if player_id in requested:
+                    found.setdefault(player_id, 0)
+                    matched += 1
+            if players and not matched:
+                log.warning("BattleMetrics ignored filter[ids], falling back to per-player Steam ID lookups")
+                self.bulk_enabled = False
+                return found
+            for player_id, steam_id in iter_steam_ids(data.get('included') or []):
+                if player_id in found:
+                    found[player_id] = steam_id
+
+            url = (data.get('links') or {}).get('next')
+            params = None
+            if not url or len(found) == len(requested):
+                break
+
+        return found
+
+    async def _fetch_one(self, player_id: int) -> Optional[int]:
+        """Запит одного гравця; None якщо відповіді так і не отримали"""
+        params = {
+            'include': 'identifier',
+            'filter[identifiers]': 'steamID'
+        }
+
+        # 429 обробляє клієнт (глобальна пауза), тут повторюємо тільки мережеві помилки
+        max_retries = 3
+        for attempt in range(max_retries):
+            try:
+                response = await self.client.get(f"/players/{player_id}", params=params)
+            except Exception as e:
+                log.warning("Error fetching Steam ID for player %s: %s", player_id, e)
+                if attempt < max_retries - 1:
+                    await asyncio.sleep(2)
+                    continue
+                return None
+
+            if response.status != 200:
+                log.warning("Failed to fetch Steam ID for player %s: HTTP %s", player_id, response.status)
+                return None
+
+            for _, steam_id in iter_steam_ids(response.json().get('included') or [], default_player_id=player_id):
+                log.debug("Player %s: Steam ID %s", player_id, steam_id)
+                return steam_id
+            log.debug("Player %s: no Steam ID", player_id)
+            return 0
+        return None
+
+# Глобальний resolver Steam ID
+steam_id_resolver = SteamIdResolver()
@@ -0,0 +1,137 @@
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from settings import Settings
+from tools import Tools
+
+log = logging.getLogger(__name__)
+
+class Subscription:
+    """Повідомлення з топом, яке бот автоматично оновлює"""
+
+    __slots__ = ('guild_id', 'channel_id', 'message_id', 'view', 'content_hash')
+
+    def __init__(self, guild_id: Optional[int], channel_id: int, message_id: int, view: str,
+                 content_hash: Optional[str] = None):
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.message_id = message_id
+        self.view = view
+        # Хеш вмісту останнього відправленого embed - якщо не змінився, редагувати не треба
+        self.content_hash = content_hash
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'guild_id': self.guild_id,
+            'channel_id': self.channel_id,
+            'message_id': self.message_id,
+            'view': self.view,
+            'content_hash': self.content_hash
+        }
+
+    @property
+    def key(self) -> Tuple[int, int]:
+        return self.channel_id, self.message_id
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Subscription':
+        return cls(data.get('guild_id'), data['channel_id'], data['message_id'], data['view'], data.get('content_hash'))
+
+class SubscriptionRegistry:
+    """Збережений на диску список підписок на автооновлення топу
+
+    Файл можуть змінювати кілька бот-процесів (BOT_MODE=consumer), тому перед кожною зміною
+    реєстр перечитується, якщо файл переписав хтось інший.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._subscriptions: List[Subscription] = []
+        self._loaded = False
+        # (mtime, inode) файлу при останньому читанні чи записі - os.replace завжди дає новий inode
+        self._version: Optional[Tuple[int, int]] = None
+
+    def load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if self._read():
+            log.info("🦍 Loaded %d auto-update subscriptions", len(self._subscriptions))
+
+    def reload_if_changed(self) -> bool:
+        """Перечитує файл, якщо його змінив інший процес"""
+        if not self._loaded:
+            self.load()
+            return True
+        if self._stat() == self._version:
+            return False
+        return self._read()
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_ino
+
+    def _read(self) -> bool:
+        try:
+            version = self._stat()
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._subscriptions = [Subscription.from_dict(item) for item in data['subscriptions']]
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            log.warning("🦍 Could not read subscriptions %s: %s", self.path, e)
+            return False
+        self._version = version
+        return True
+
+    def save(self):
+        Tools.atomic_write_json(self.path, {
+            'subscriptions': [subscription.to_dict() for subscription in self._subscriptions]
+        })
+        self._version = self._stat()
+
+    def all(self) -> List[Subscription]:
+        self.reload_if_changed()
+        return list(self._subscriptions)
+
+    def add(self, subscription: Subscription):
+        """Додає підписку; попередня підписка того ж каналу на той самий вигляд замінюється"""
+        self.reload_if_changed()
+        self._subscriptions = [
+            existing for existing in self._subscriptions
+            if not (existing.channel_id == subscription.channel_id and existing.view == subscription.view)
+        ]
+        self._subscriptions.append(subscription)
+        self.save()
+
+    def remove_channel(self, channel_id: int) -> int:
+        """Видаляє всі підписки каналу; повертає скільки видалено"""
+        self.reload_if_changed()
+        before = len(self._subscriptions)
+        self._subscriptions = [existing for existing in self._subscriptions if existing.channel_id != channel_id]
+        removed = before - len(self._subscriptions)
+        if removed:
+            self.save()
+        return removed
+
+    def remove(self, subscription: Subscription):
+        self.reload_if_changed()
+        self._subscriptions = [existing for existing in self._subscriptions if existing.key != subscription.key]
+        self.save()
+
+    def save_hashes(self, subscriptions: Iterable[Subscription]):
+        """Записує хеші відредагованих повідомлень, не затираючи підписки, додані іншими процесами"""
+        hashes = {subscription.key: subscription.content_hash for subscription in subscriptions}
+        self.reload_if_changed()
+        for existing in self._subscriptions:
+            if existing.key in hashes:
+                existing.content_hash = hashes[existing.key]
+        self.save()
+
+# Глобальний реєстр підписок
+subscription_registry = SubscriptionRegistry(Settings.SUBSCRIPTIONS_PATH)
@@ -0,0 +1,34 @@
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from activity_aggregates import ActivityAggregates
+
+@pytest.mark.parametrize('document', [
+    [],
+    'x',
+    {'players': []},
+    {'players': {'1': [5]}},
+    {'players': {'1': {'7': 'lots'}}},
+])
+def test_malformed_day_is_skipped(tmp_path, document):
+    today = datetime.now(timezone.utc).date().isoformat()
+    (tmp_path / f'{today}.json').write_text(json.dumps(document), encoding='utf-8')
+    (tmp_path / '2000-01-01.json').write_text('[]', encoding='utf-8')
+
+    activity = ActivityAggregates(str(tmp_path))
+    activity.load()
+    assert activity.days == {}
+    assert activity.daily_totals(1) == [(today, 0, 0)]
+
+    # Виправлений фетчером файл підхоплюється при наступній перевірці
+    (tmp_path / f'{today}.json').write_text(json.dumps({'players': {'1': {'7': 60}}, 'names': {'1': 'gorilla'}}),
+                                            encoding='utf-8')
+    os.utime(tmp_path / f'{today}.json', ns=(1, 1))
+    activity.reload_changed()
+    assert activity.most_active(1, 10) == [(1, 'gorilla', 60)]
@@ -0,0 +1,42 @@
+import asyncio
+import os
+import sys
+
+import discord
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auto_top import AutoTopScheduler
+from subscriptions import Subscription, SubscriptionRegistry
+
+class FakeResponse:
+    status = 403
+    reason = 'Forbidden'
+
+class FakeEmbeds:
+    def get(self, view):
+        return discord.Embed(title=view)
+
+    def content_hash(self, view):
+        return 'new'
+
+class ForbiddenMessage:
+    async def edit(self, embed):
+        raise discord.Forbidden(FakeResponse(), 'Missing Access')
+
+class ForbiddenChannel:
+    def get_partial_message(self, message_id):
+        return ForbiddenMessage()
+
+class FakeClient:
+    def get_channel(self, channel_id):
+        return ForbiddenChannel()
+
+def test_forbidden_edit_unsubscribes(tmp_path):
+    registry = SubscriptionRegistry(str(tmp_path / 'subscriptions.json'))
+    registry.add(Subscription(1, 10, 100, 'auto', 'old'))
+
+    edited = asyncio.run(AutoTopScheduler(registry, FakeEmbeds()).run_once(FakeClient()))
+
+    assert edited == 0
+    assert SubscriptionRegistry(registry.path).all() == []
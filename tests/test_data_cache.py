@@ -0,0 +1,70 @@
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bm_client import BMResponse
+from data_cache import DataCache
+from history_store import HistoryStore
+from month_archive import MonthArchive
+from parser import Parser
+from settings import Settings
+from tools import Tools
+
+@pytest.mark.parametrize('document', [
+    [],
+    'generation 5',
+    {'generation': 5, 'last_update': 'not a date'},
+    {'generation': 'five'},
+])
+def test_malformed_snapshot_is_rejected(tmp_path, monkeypatch, document):
+    path = tmp_path / 'cache_snapshot.json'
+    path.write_text(json.dumps(document), encoding='utf-8')
+    monkeypatch.setattr(Settings, 'CACHE_SNAPSHOT_PATH', str(path))
+
+    cache = DataCache()
+    assert cache.load_snapshot() is False
+    assert cache.generation.number == 0
+
+class MonthsClient:
+    """Поточний місяць - один гравець на кожному сервері, попередній місяць порожній (або сервер 2 падає)"""
+
+    def __init__(self, previous_fails: bool = False):
+        self.previous_fails = previous_fails
+
+    async def get(self, url, params=None):
+        previous = params and params.get('filter[period]') == Tools.get_previous_month_period()
+        if previous and self.previous_fails and '/servers/2/' in url:
+            return BMResponse(500, {}, b'', url)
+        rows = [] if previous else [{'id': '1', 'attributes': {'name': 'gorilla', 'value': 600}}]
+        return BMResponse(200, {}, json.dumps({'data': rows, 'links': {}}).encode(), url)
+
+def refresh(tmp_path, monkeypatch, client):
+    async def no_steam_ids(self, players, limit=None):
+        pass
+
+    monkeypatch.setattr(Settings, 'TOKEN_BM', 'token')
+    monkeypatch.setattr(Settings, 'SERVER_IDS', [1, 2])
+    monkeypatch.setattr(Settings, 'INCREMENTAL_REFRESH', False)
+    monkeypatch.setattr(Settings, 'CACHE_SNAPSHOT_PATH', str(tmp_path / 'cache_snapshot.json'))
+    monkeypatch.setattr(Parser, 'resolve_steam_ids', no_steam_ids)
+
+    cache = DataCache(client=client, archive=MonthArchive(str(tmp_path / 'months')),
+                      history=HistoryStore(str(tmp_path / 'history.sqlite3')))
+    return cache, asyncio.run(cache._refresh())
+
+def test_empty_previous_month_is_published(tmp_path, monkeypatch):
+    cache, ok = refresh(tmp_path, monkeypatch, MonthsClient())
+    assert ok
+    assert cache.generation.number == 1
+    assert [(player.id, player.value) for player in cache.current_month_data] == [(1, 1200)]
+    assert len(cache.previous_month_data) == 0
+
+def test_failed_previous_month_keeps_generation(tmp_path, monkeypatch):
+    cache, ok = refresh(tmp_path, monkeypatch, MonthsClient(previous_fails=True))
+    assert not ok
+    assert cache.generation.number == 0
@@ -0,0 +1,68 @@
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bm_client import BMResponse
+from paginator import LeaderboardPaginator
+from parser import Parser
+
+class FakeClient:
+    """Віддає заздалегідь підготовлені сторінки лідерборду за URL"""
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    async def get(self, url, params=None):
+        if url not in self.pages:
+            return BMResponse(500, {}, b'', url)
+        rows, next_url = self.pages[url]
+        body = json.dumps({
+            'data': [{'id': str(player_id), 'attributes': {'name': f"p{player_id}", 'value': value}}
+                     for player_id, value in rows],
+            'links': {'next': next_url} if next_url else {}
+        }).encode()
+        return BMResponse(200, {}, body, url)
+
+def fetch_top(pages, server_ids, top_n):
+    client = FakeClient(pages)
+    paginators = [LeaderboardPaginator(client, server_id, {}) for server_id in server_ids]
+    players = asyncio.run(Parser(client=client)._fetch_top_players(paginators, top_n))
+    return [(player.id, player.value) for player in players]
+
+def test_leader_unread_rows_on_other_server_are_counted():
+    # Лідер 2 ще не бачений на сервері B, а B має непрочитану сторінку з його рядком
+    pages = {
+        '/servers/1/relationships/leaderboards/time': ([(1, 5000), (2, 4900), (8, 100)], None),
+        '/servers/2/relationships/leaderboards/time': ([(3, 400), (4, 350)], 'b-page-2'),
+        'b-page-2': ([(2, 300)], None),
+    }
+    assert fetch_top(pages, [1, 2], top_n=2) == [(2, 5200), (1, 5000)]
+
+def test_settled_top_skips_remaining_pages():
+    # Обидва лідери бачені на обох серверах, решта не дотягне - друга сторінка B не потрібна
+    pages = {
+        '/servers/1/relationships/leaderboards/time': ([(1, 5000), (2, 4900), (8, 100)], None),
+        '/servers/2/relationships/leaderboards/time': ([(1, 400), (2, 350)], 'b-page-2'),
+    }
+    assert fetch_top(pages, [1, 2], top_n=2) == [(1, 5400), (2, 5250)]
+
+def test_failed_server_fails_the_whole_top():
+    # Сервер 2 відповідає помилкою - топ лише з сервера 1 не повинен видаватись за результат
+    pages = {
+        '/servers/1/relationships/leaderboards/time': ([(1, 5000), (2, 4900)], None),
+    }
+    assert fetch_top(pages, [1, 2], top_n=2) == []
+
+def test_max_pages_marks_server_truncated():
+    # Ліміт сторінок обрізав сервер - такий топ не можна заморожувати як повний місяць
+    pages = {
+        '/servers/1/relationships/leaderboards/time': ([(1, 5000)], 'a-page-2'),
+        'a-page-2': ([(2, 4000)], None),
+    }
+    client = FakeClient(pages)
+    paginator = LeaderboardPaginator(client, 1, {}, max_pages=1)
+    asyncio.run(paginator.fetch_next())
+    assert paginator.status == 'truncated'
@@ -0,0 +1,31 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_cache import CacheGeneration, DataCache
+from leaderboard import Leaderboard
+from parser import Player
+from player_index import PlayerIndex
+
+def generation(number, *players):
+    rows = []
+    for player_id, name, value, steam_id in players:
+        player = Player(name, player_id, value)
+        player.steam_id = steam_id
+        rows.append(player)
+    return CacheGeneration(number, Leaderboard.from_players(rows), Leaderboard.empty(), None)
+
+def test_changed_steam_id_replaces_the_old_mapping():
+    cache = DataCache()
+    index = PlayerIndex(cache)
+    cache.generation = generation(1, (1, 'gorilla', 600, 76561197960265729))
+    assert [entry.player_id for entry in index.search('76561197960265729')] == [1]
+
+    # Гравець прив'язав інший Steam акаунт
+    cache.generation = generation(2, (1, 'gorilla', 900, 76561197960265730))
+    index.update(cache.generation)
+
+    assert index._by_steam_id == {76561197960265730: 1}
+    assert index.search('76561197960265729') == []
+    assert [entry.player_id for entry in index.search('76561197960265730')] == [1]
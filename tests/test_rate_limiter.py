@@ -0,0 +1,83 @@
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from fake_battlemetrics import FakeBattleMetrics
+from bm_client import BattleMetricsClient
+from rate_limiter import RateLimiter
+from settings import Settings
+
+def acquire_times(limiter, count, before=None):
+    """Запускає count одночасних acquire і повертає, через скільки секунд кожен отримав токен"""
+    async def run():
+        if before:
+            before(limiter)
+        started = time.monotonic()
+
+        async def one():
+            await limiter.acquire()
+            return time.monotonic() - started
+        return await asyncio.gather(*(one() for _ in range(count)))
+    return asyncio.run(run())
+
+def test_burst_then_steady_rate():
+    # 600 в хвилину = токен кожні 0.1 с; перші два - одразу з відра
+    times = acquire_times(RateLimiter(600, 2), 4)
+    assert times[0] < 0.05 and times[1] < 0.05
+    assert 0.08 <= times[2] < 0.2
+    assert 0.18 <= times[3] < 0.3
+
+def test_backoff_pauses_all_requests():
+    limiter = RateLimiter(60000, 10)
+    times = acquire_times(limiter, 3, before=lambda limiter: limiter.backoff(0.2))
+    assert min(times) >= 0.19
+    assert limiter.get_stats()['rate_limited'] == 1
+    assert limiter.get_stats()['delayed'] >= 1
+
+def test_retry_after_header_formats():
+    assert BattleMetricsClient._parse_retry_after('2.5') == 2.5
+    assert BattleMetricsClient._parse_retry_after(None) == Settings.BM_DEFAULT_RETRY_AFTER
+    assert BattleMetricsClient._parse_retry_after('soon') == Settings.BM_DEFAULT_RETRY_AFTER
+    in_a_minute = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=60), usegmt=True)
+    assert 55 <= BattleMetricsClient._parse_retry_after(in_a_minute) <= 60
+
+def get_from_fake(path, count, **fake_options):
+    """Робить count послідовних запитів до фейкового Battlemetrics; повертає (статуси, секунди, fake, лімітер)"""
+    fake = FakeBattleMetrics([1], players=10, **fake_options)
+    limiter = RateLimiter(60000, 1000)
+
+    async def run():
+        runner = await fake.start()
+        client = BattleMetricsClient(fake.base_url, limiter)
+        try:
+            started = time.monotonic()
+            statuses = [(await client.get(path)).status for _ in range(count)]
+            return statuses, time.monotonic() - started
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    statuses, elapsed = asyncio.run(run())
+    return statuses, elapsed, fake, limiter
+
+def test_429_is_retried_after_retry_after():
+    statuses, elapsed, fake, limiter = get_from_fake('/servers/1', 2, rate_limit_every=2, retry_after=0.2)
+    assert statuses == [200, 200]
+    assert fake.requests['429'] == 1
+    assert fake.requests['total'] == 3
+    assert limiter.rate_limited == 1
+    assert elapsed >= 0.19
+
+def test_429_retries_are_bounded(monkeypatch):
+    monkeypatch.setattr(Settings, 'BM_MAX_RETRIES', 2)
+    statuses, _, fake, limiter = get_from_fake('/servers/1', 1, rate_limit_every=1, retry_after=0.05)
+    assert statuses == [429]
+    assert fake.requests['total'] == 3
+    assert limiter.rate_limited == 3
@@ -0,0 +1,37 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from running_totals import RunningTotals
+
+@pytest.mark.parametrize('document', [
+    [],
+    'x',
+    {'month': '2026-10', 'totals': [], 'names': {}},
+    {'month': '2026-10', 'totals': {'1': 5}, 'names': {}},
+    {'month': '2026-10', 'window_end': 5, 'totals': {}, 'names': {}},
+])
+def test_malformed_totals_are_reset(tmp_path, document):
+    path = tmp_path / 'current_month.json'
+    path.write_text(json.dumps(document), encoding='utf-8')
+
+    totals = RunningTotals(str(path))
+    assert totals.load() is False
+    assert totals.month_key is None
+    assert totals.totals == {}
+
+def test_totals_round_trip(tmp_path):
+    path = tmp_path / 'current_month.json'
+    path.write_text(json.dumps({
+        'month': '2026-10', 'window_end': '2026-10-18T12:00:00+00:00', 'last_full': None,
+        'totals': {'1': {'7': 300, '8': 60}}, 'names': {'1': 'gorilla'}
+    }), encoding='utf-8')
+
+    totals = RunningTotals(str(path))
+    assert totals.load() is True
+    assert totals.totals == {1: {7: 300, 8: 60}}
+    assert totals.server_leaders(7, 10) == [(1, 'gorilla', 300)]
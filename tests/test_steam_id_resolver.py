@@ -0,0 +1,52 @@
+import asyncio
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from fake_battlemetrics import FakeBattleMetrics
+from bm_client import BattleMetricsClient
+from rate_limiter import RateLimiter
+from steam_id_cache import SteamIdCache
+from steam_id_resolver import SteamIdResolver
+
+def resolve(tmp_path, player_ids_of, **fake_options):
+    """Піднімає фейковий Battlemetrics і шукає Steam ID гравців, яких обирає player_ids_of(fake)"""
+    fake = FakeBattleMetrics([1], players=200, **fake_options)
+
+    async def run():
+        runner = await fake.start()
+        client = BattleMetricsClient(fake.base_url, RateLimiter(60000, 1000))
+        try:
+            cache = SteamIdCache(str(tmp_path / 'steam_ids.sqlite3'))
+            resolver = SteamIdResolver(client, cache, batch_size=10)
+            player_ids = player_ids_of(fake)
+            return resolver, cache, player_ids, await resolver.resolve(player_ids)
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    resolver, cache, player_ids, result = asyncio.run(run())
+    return fake, resolver, cache, player_ids, result
+
+def expected_steam_ids(fake, player_ids):
+    return {player_id: fake.players[player_id][1] for player_id in player_ids}
+
+def test_bulk_lookup_uses_one_request_per_batch(tmp_path):
+    fake, resolver, _, player_ids, result = resolve(tmp_path, lambda fake: list(fake.players)[:15])
+    assert result == expected_steam_ids(fake, player_ids)
+    assert resolver.bulk_enabled
+    assert fake.requests['players_bulk'] == 2
+    assert fake.requests['player'] == 0
+
+def test_ignored_filter_falls_back_to_single_lookups(tmp_path):
+    # API віддає всю колекцію /players замість запитаних гравців - не ходимо по ній і не кешуємо чужих
+    fake, resolver, cache, player_ids, result = resolve(tmp_path, lambda fake: list(fake.players)[-15:],
+                                                        ignore_player_filter=True)
+    assert result == expected_steam_ids(fake, player_ids)
+    assert not resolver.bulk_enabled
+    assert fake.requests['players_bulk'] == 2
+    assert fake.requests['player'] == len(player_ids)
+    assert set(cache._entries) == set(player_ids)
@@ -0,0 +1,26 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from subscriptions import Subscription, SubscriptionRegistry
+
+def test_registries_of_two_processes_keep_each_others_subscriptions(tmp_path):
+    # Два бот-процеси зі спільним файлом підписок
+    path = str(tmp_path / 'subscriptions.json')
+    owner, other = SubscriptionRegistry(path), SubscriptionRegistry(path)
+    owner.add(Subscription(1, 10, 100, 'auto'))
+    other.add(Subscription(2, 20, 200, 'auto'))
+
+    subscriptions = owner.all()
+    assert sorted(subscription.key for subscription in subscriptions) == [(10, 100), (20, 200)]
+
+    # Поки власник автотопу редагує повідомлення, інший процес додає ще одну підписку
+    for subscription in subscriptions:
+        subscription.content_hash = f"hash-{subscription.message_id}"
+    other.add(Subscription(3, 30, 300, 'auto'))
+    owner.save_hashes(subscriptions)
+
+    hashes = {subscription.key: subscription.content_hash for subscription in SubscriptionRegistry(path).all()}
+    assert hashes == {(10, 100): 'hash-100', (20, 200): 'hash-200', (30, 300): None}
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
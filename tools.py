@@ -1,15 +1,19 @@
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from typing import Any, List, Optional, Tuple
 import calendar
+import json
+import os
+import tempfile
 
 class Tools:
     @staticmethod
-    def get_period() -> str:
-        """Повертає період для поточного місяця у форматі ISO 8601"""
+    def get_period(start: Optional[datetime] = None, end: Optional[datetime] = None) -> str:
+        """Повертає період у форматі ISO 8601 (за замовчуванням - з початку поточного місяця до зараз)"""
         now = datetime.now(timezone.utc)
         first_day_of_month = datetime(now.year, now.month, 1, 0, 0, 0, tzinfo=timezone.utc)
         
-        start_date_str = first_day_of_month.strftime("%Y-%m-%dT%H:%M:%SZ")
-        end_date_str = now.strftime("%Y-%m-%dT%H:%M:%SZ")
+        start_date_str = (start or first_day_of_month).strftime("%Y-%m-%dT%H:%M:%SZ")
+        end_date_str = (end or now).strftime("%Y-%m-%dT%H:%M:%SZ")
         
         return f"{start_date_str}:{end_date_str}"
     
@@ -70,6 +74,59 @@ class Tools:
         
         return f"{start_date_str}:{end_date_str}"
     
+    @staticmethod
+    def get_month_key(months_ago: int = 0) -> str:
+        """Повертає ключ місяця у форматі YYYY-MM (0 - поточний, 1 - попередній, ...)"""
+        now = datetime.now(timezone.utc)
+        month_index = now.year * 12 + (now.month - 1) - months_ago
+        return f"{month_index // 12:04d}-{month_index % 12 + 1:02d}"
+    
+    @staticmethod
+    def get_day_key(moment: Optional[datetime] = None) -> str:
+        """Повертає ключ дня у форматі YYYY-MM-DD (UTC, за замовчуванням - сьогодні)"""
+        return (moment or datetime.now(timezone.utc)).strftime("%Y-%m-%d")
+    
+    @staticmethod
+    def split_at_midnight(start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+        """Ріже вікно [start, end] на частини по межах днів (UTC), щоб кожна належала одному дню"""
+        windows = []
+        while True:
+            midnight = datetime(start.year, start.month, start.day, tzinfo=timezone.utc) + timedelta(days=1)
+            if midnight >= end:
+                windows.append((start, end))
+                return windows
+            windows.append((start, midnight))
+            start = midnight
+    
+    @staticmethod
+    def seconds_since_month_start() -> float:
+        """Скільки секунд минуло з початку поточного місяця (UTC)"""
+        now = datetime.now(timezone.utc)
+        first_day_of_month = datetime(now.year, now.month, 1, 0, 0, 0, tzinfo=timezone.utc)
+        return (now - first_day_of_month).total_seconds()
+    
+    @staticmethod
+    def atomic_write_json(path: str, data: Any):
+        """Атомарно записує JSON у файл (через тимчасовий файл і os.replace)"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        # Унікальний тимчасовий файл - той самий файл можуть одночасно писати кілька процесів або потоків
+        fd, tmp_path = tempfile.mkstemp(dir=directory or None, prefix=f"{os.path.basename(path)}.", suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+    
     @staticmethod
     def format_time(seconds: int) -> str:
         """Форматує час у секундах в формат 1d 2h 3m 4s"""
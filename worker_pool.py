@@ -0,0 +1,72 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+from settings import Settings
+from metrics import worker_task_seconds
+
+log = logging.getLogger(__name__)
+
+MODES = ('thread', 'process', 'inline')
+
+class WorkerPool:
+    """Виконує CPU-важкі етапи оновлення поза event loop, щоб не гальмувати heartbeat і команди Discord
+
+    mode: 'thread' - потоки (event loop отримує GIL щонайменше кожні sys.getswitchinterval() секунд),
+    'process' - окремі процеси (справжній паралелізм, але аргументи і результат проходять через pickle),
+    'inline' - прямо в event loop, як раніше.
+    Для 'process' функція має бути функцією модуля, а аргументи і результат - компактними даними
+    (словники, списки, кортежі), без об'єктів зі станом.
+    """
+
+    def __init__(self, mode: str = Settings.WORKER_POOL, size: int = Settings.WORKER_POOL_SIZE,
+                 min_items: int = Settings.WORKER_POOL_MIN_ITEMS):
+        if mode not in MODES:
+            log.warning("Unknown worker pool mode %s, using thread", mode)
+            mode = 'thread'
+        self.mode = mode
+        self.size = size
+        self.min_items = min_items
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.mode == 'process':
+                # spawn, а не fork: форк процесу з працюючим event loop і потоками aiohttp може зависнути
+                self._executor = ProcessPoolExecutor(self.size, mp_context=multiprocessing.get_context('spawn'))
+            else:
+                self._executor = ThreadPoolExecutor(self.size, thread_name_prefix='refresh-worker')
+            log.info("Started %s worker pool with %d workers", self.mode, self.size)
+        return self._executor
+
+    async def run(self, stage: str, func: Callable[..., Any], *args, items: Optional[int] = None) -> Any:
+        """Виконує func(*args) в пулі; items - розмір вхідних даних (малі обсяги дешевше порахувати на місці)"""
+        started = time.perf_counter()
+        mode = self.mode
+        if mode == 'inline' or (items is not None and items < self.min_items):
+            mode = 'inline'
+            result = func(*args)
+        else:
+            loop = asyncio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(self._get_executor(), functools.partial(func, *args))
+            except BrokenProcessPool as e:
+                # Процес-воркер впав (наприклад, OOM) - пересоздамо пул наступного разу, а зараз рахуємо на місці
+                log.error("Worker pool broken during %s stage, running inline: %s", stage, e)
+                self._executor = None
+                mode = 'inline'
+                result = func(*args)
+        worker_task_seconds.observe(time.perf_counter() - started, stage=stage, mode=mode)
+        return result
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+# Глобальний пул для етапів оновлення
+worker_pool = WorkerPool()